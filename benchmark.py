@@ -0,0 +1,144 @@
+# benchmark.py
+"""
+Throughput benchmark of ai_overview_detector against the offline SERP stand-in.
+
+    python benchmark.py --keywords 200 --workers 4 --navigation direct --json bench.json
+
+Reports keywords/minute, per-phase latency percentiles and peak memory of the
+process tree (Python, chromedriver and Chrome), so every pacing, pooling or
+navigation change can be compared against a saved baseline.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from http_fetch import HttpFetcher
+from metrics import Metrics
+from retry_queue import NO_RETRY
+from scraper import (
+    ENGINE_SELENIUM, ENGINES, NAVIGATION_MODES, NAVIGATION_TYPING, NO_PACING, PacingPolicy, RESOURCE_POLICIES,
+    _process_tree_rss_mb, ai_overview_detector,
+)
+from serp_standin import SerpStandIn
+
+
+class MemorySampler:
+    """Samples the RSS of this process and all its children, keeping the peak."""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, _process_tree_rss_mb(os.getpid()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_benchmark(keywords=100, workers=1, tabs=1, engine=ENGINE_SELENIUM, navigation=NAVIGATION_TYPING, resource_policy="lean",
+                  pacing=NO_PACING, retry=NO_RETRY, http_first=False, **standin_options):
+    """
+    Run one detector pass against a fresh stand-in and return the report dict.
+    Retries are off by default so the bot and error rates are per search.
+    With `http_first` the HTTP tier runs first and trusts plain results pages,
+    since the stand-in serves every page fully rendered.
+    """
+    standin = SerpStandIn(**standin_options)
+    base_url = standin.start()
+    keyword_list = [f"benchmark keyword {i}" for i in range(keywords)]
+    metrics = Metrics(keep_samples=True)
+    try:
+        with MemorySampler() as memory:
+            started = time.monotonic()
+            results = ai_overview_detector(
+                keyword_list, workers=workers, tabs=tabs, engine=engine, navigation=navigation, resource_policy=resource_policy,
+                pacing=pacing, retry=retry, sinks=[], base_url=base_url, metrics=metrics,
+                http_tier=HttpFetcher(trust_results=True) if http_first else None,
+            )
+            elapsed = time.monotonic() - started
+    finally:
+        standin.stop()
+
+    phases = metrics.summary()["phases"]
+    settled = [r for r in results if not r["bot_detected"] and not r.get("error")]
+    return {
+        "keywords": keywords,
+        "workers": workers,
+        "tabs": tabs,
+        "engine": engine,
+        "http_first": http_first,
+        "http_settled": metrics.counters.get("http_settled", 0),
+        "navigation": navigation,
+        "resource_policy": resource_policy,
+        "elapsed_s": elapsed,
+        "keywords_per_minute": keywords / elapsed * 60 if elapsed else 0.0,
+        "bot_detection_rate": sum(1 for r in results if r["bot_detected"]) / keywords if keywords else 0.0,
+        "error_rate": sum(1 for r in results if r.get("error")) / keywords if keywords else 0.0,
+        # Stand-in answers are deterministic, so any disagreement is a classifier bug
+        "misclassified": sum(1 for r in settled if r["detected"] != standin.has_overview(r["keyword"])),
+        "latency_ms": {
+            phase: {key[:-3]: stats[key] for key in ("p50_ms", "p90_ms", "p99_ms", "mean_ms")}
+            for phase, stats in phases.items()
+        },
+        "time_share": {phase: stats["share"] for phase, stats in phases.items()},
+        "peak_rss_mb": memory.peak_mb,
+        "server_counts": standin.counts,
+    }
+
+
+def print_report(report):
+    print("\n=== Benchmark ===")
+    print(f"{report['keywords']} keywords, {report['workers']} worker(s), "
+          f"{report['navigation']} navigation, {report['resource_policy']} resources")
+    print(f"⏱️ {report['elapsed_s']:.1f}s -> {report['keywords_per_minute']:.1f} keywords/min")
+    if report["http_first"]:
+        print(f"🌐 {report['http_settled']} keywords settled over HTTP without a browser")
+    print(f"🤖 bot detection {report['bot_detection_rate']:.1%}, errors {report['error_rate']:.1%}, "
+          f"misclassified {report['misclassified']}")
+    for phase, stats in report["latency_ms"].items():
+        print(f"   {phase:<15} " + "  ".join(f"{name} {value:8.1f}ms" for name, value in stats.items())
+              + f"  ({report['time_share'][phase]:.0%} of time)")
+    print(f"💾 peak RSS {report['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the detector against the offline SERP stand-in")
+    parser.add_argument("--keywords", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tabs", type=int, default=1)
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE_SELENIUM)
+    parser.add_argument("--navigation", choices=NAVIGATION_MODES, default=NAVIGATION_TYPING)
+    parser.add_argument("--http-first", action="store_true", help="settle what plain HTTP can before the browsers")
+    parser.add_argument("--resource-policy", choices=tuple(RESOURCE_POLICIES), default="lean")
+    parser.add_argument("--human-pacing", action="store_true", help="keep the default PacingPolicy delays")
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.05, 0.2), metavar=("MIN", "MAX"))
+    parser.add_argument("--captcha-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        keywords=args.keywords, workers=args.workers, tabs=args.tabs, engine=args.engine, navigation=args.navigation,
+        resource_policy=args.resource_policy, http_first=args.http_first, pacing=PacingPolicy() if args.human_pacing else NO_PACING,
+        latency=tuple(args.latency), captcha_rate=args.captcha_rate, error_rate=args.error_rate,
+        slow_rate=args.slow_rate, seed=args.seed,
+    )
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,373 @@
+# cdp_engine.py
+"""
+asyncio Chrome DevTools Protocol backend, used by ai_overview_detector(engine="cdp").
+
+Chrome is started directly (no chromedriver) and every page is driven over
+one browser-level websocket with flattened target sessions, so a single
+event loop multiplexes all browsers and pages without a thread per browser.
+Pages reuse the Selenium backend's classifier script, result records,
+retries and feedback, so both engines produce the same results.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+
+from scraper import (
+    JAKARTA_GEOLOCATION, OVERVIEW_GRACE, PAGE_STATE_CAPTCHA, PAGE_STATE_WAIT, RESOURCE_POLICIES, BotDetector,
+    PageStateTracker, _Batch, _error_result, _page_result, _search_timings, _capture, build_search_url,
+    read_pickled_cookies,
+)
+from session_pool import cdp_cookie
+
+CHROME_BINARIES = ("chromium", "chromium-browser", "google-chrome", "google-chrome-stable")
+CHROME_ARGUMENTS = (
+    "--headless=new",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--window-size=1920,1080",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-notifications",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    # Chrome picks a free port itself and prints it, so browsers never collide
+    "--remote-debugging-port=0",
+)
+
+
+class CdpError(Exception):
+    """A DevTools command failed or the connection to Chrome went away."""
+
+
+class CdpConnection:
+    """
+    One DevTools websocket. Commands are matched to their replies by id;
+    page sessions attached with flatten=True share the socket via sessionId.
+    Events are not consumed, page state is polled instead.
+    """
+
+    def __init__(self, websocket):
+        self._websocket = websocket
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._reader = asyncio.create_task(self._read())
+
+    @classmethod
+    async def connect(cls, url):
+        return cls(await websockets.connect(url, max_size=None, ping_interval=None))
+
+    @property
+    def closed(self):
+        return self._reader.done()
+
+    async def send(self, method, params=None, session_id=None):
+        if self.closed:
+            raise CdpError("DevTools connection is closed")
+        message = {"id": next(self._ids), "method": method, "params": params or {}}
+        if session_id is not None:
+            message["sessionId"] = session_id
+        reply = asyncio.get_running_loop().create_future()
+        self._pending[message["id"]] = reply
+        await self._websocket.send(json.dumps(message))
+        return await reply
+
+    async def _read(self):
+        try:
+            async for raw in self._websocket:
+                message = json.loads(raw)
+                reply = self._pending.pop(message.get("id"), None)
+                if reply is None or reply.done():
+                    continue
+                if "error" in message:
+                    reply.set_exception(CdpError(f"{message['error'].get('message')} ({message['error'].get('code')})"))
+                else:
+                    reply.set_result(message.get("result", {}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for reply in self._pending.values():
+                if not reply.done():
+                    reply.set_exception(CdpError("DevTools connection closed"))
+            self._pending.clear()
+
+    async def close(self):
+        await self._websocket.close()
+        await self._reader
+
+
+class CdpPage:
+    """
+    A page in its own browser context (cookies, storage and cache isolated
+    like an incognito window), with the operations the detector needs.
+    """
+
+    def __init__(self, connection, context_id, target_id, session_id):
+        self.connection = connection
+        self.context_id = context_id
+        self.target_id = target_id
+        self.session_id = session_id
+
+    @classmethod
+    async def open(cls, connection):
+        context_id = (await connection.send("Target.createBrowserContext"))["browserContextId"]
+        target_id = (await connection.send("Target.createTarget", {
+            "url": "about:blank", "browserContextId": context_id,
+        }))["targetId"]
+        session_id = (await connection.send("Target.attachToTarget", {
+            "targetId": target_id, "flatten": True,
+        }))["sessionId"]
+        return cls(connection, context_id, target_id, session_id)
+
+    async def send(self, method, params=None):
+        return await self.connection.send(method, params, session_id=self.session_id)
+
+    async def navigate(self, url):
+        result = await self.send("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            raise CdpError(f"Navigation to {url} failed: {result['errorText']}")
+
+    async def set_geolocation(self, geolocation=JAKARTA_GEOLOCATION):
+        await self.send("Emulation.setGeolocationOverride", geolocation)
+
+    async def block_urls(self, patterns):
+        await self.send("Network.enable")
+        await self.send("Network.setBlockedURLs", {"urls": list(patterns)})
+
+    async def set_cookies(self, cookies, url):
+        """Inject WebDriver-style cookie dicts with all their attributes (see session_pool.cdp_cookie)."""
+        if cookies:
+            await self.send("Network.setCookies", {"cookies": [cdp_cookie(c, url) for c in cookies]})
+
+    async def execute_script(self, script, *args):
+        """Run a Selenium-style script body (`arguments`, `return`) and return its JSON value."""
+        expression = f"(function() {{{script}\n}}).apply(null, {json.dumps(list(args))})"
+        result = await self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True})
+        if "exceptionDetails" in result:
+            raise CdpError(result["exceptionDetails"].get("text", "script failed"))
+        return result["result"].get("value")
+
+    async def html(self):
+        return await self.execute_script("return document.documentElement.outerHTML;")
+
+    async def query(self, selector):
+        """Text of the first element matching the CSS `selector`, or None."""
+        return await self.execute_script(
+            "const element = document.querySelector(arguments[0]); return element ? element.innerText : null;",
+            selector,
+        )
+
+    async def classify(self):
+        """Same verdict dict as BotDetector.classify, from the same injected script."""
+        started = time.perf_counter()
+        verdict = await self.execute_script(BotDetector.CLASSIFY_SCRIPT, BotDetector.selector_groups())
+        verdict["round_trip_ms"] = (time.perf_counter() - started) * 1000
+        return verdict
+
+    async def check_bot_detection(self):
+        return (await self.classify())["verdict"] == PAGE_STATE_CAPTCHA
+
+    async def wait_for_page_state(self, timeout=PAGE_STATE_WAIT, overview_grace=OVERVIEW_GRACE, poll_frequency=0.1):
+        """Awaitable scraper.wait_for_page_state: the first known state, "results" only after the overview grace."""
+        tracker = PageStateTracker(timeout, overview_grace)
+        while True:
+            try:
+                verdict = await self.classify()
+            except CdpError:
+                verdict = None  # the old document is being torn down
+            page = tracker.feed(verdict)
+            if page is not None:
+                return page
+            await asyncio.sleep(poll_frequency)
+
+    async def close(self):
+        """Drop the page together with its browser context."""
+        await self.connection.send("Target.disposeBrowserContext", {"browserContextId": self.context_id})
+
+
+class AsyncChrome:
+    """
+    One headless Chrome process driven without chromedriver.
+    The binary is `binary`, $CHROME_BIN or the first of CHROME_BINARIES on the PATH.
+    """
+
+    def __init__(self, binary=None, resource_policy="lean", metrics=None):
+        self.binary = binary or os.environ.get("CHROME_BIN")
+        self.resource_policy = resource_policy
+        self.metrics = metrics
+        self.process = None
+        self.connection = None
+        self._profile_dir = None
+        self._stderr_drain = None
+        self._lock = asyncio.Lock()
+
+    async def ensure_started(self):
+        """Start Chrome, or restart it when the previous one went away."""
+        async with self._lock:
+            if self.connection is not None and not self.connection.closed:
+                return
+            await self.close()
+            if self.metrics is not None:
+                with self.metrics.span("driver_startup"):
+                    await self._start()
+            else:
+                await self._start()
+
+    async def _start(self):
+        binary = self.binary or next(filter(None, map(shutil.which, CHROME_BINARIES)), None)
+        if binary is None:
+            raise RuntimeError(f"No Chrome binary found, set CHROME_BIN or install one of {CHROME_BINARIES}")
+        self._profile_dir = tempfile.mkdtemp(prefix="cdp-chrome-")
+        arguments = [*CHROME_ARGUMENTS, f"--user-data-dir={self._profile_dir}"]
+        if self.resource_policy != "full":
+            arguments.append("--blink-settings=imagesEnabled=false")
+        self.process = await asyncio.create_subprocess_exec(
+            binary, *arguments, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+        url = await asyncio.wait_for(self._devtools_url(), timeout=30)
+        # Keep reading stderr, a full pipe would stall Chrome
+        self._stderr_drain = asyncio.create_task(self._drain_stderr())
+        self.connection = await CdpConnection.connect(url)
+
+    async def _devtools_url(self):
+        marker = "DevTools listening on"
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                raise RuntimeError("Chrome exited before opening its DevTools endpoint")
+            text = line.decode(errors="replace")
+            if marker in text:
+                return text.split(marker, 1)[1].strip()
+
+    async def _drain_stderr(self):
+        """Read Chrome's log a line at a time and drop it, so it never piles up in memory."""
+        while await self.process.stderr.readline():
+            pass
+
+    async def new_page(self, geolocation=JAKARTA_GEOLOCATION):
+        """A fresh isolated page with the per-tab overrides of scraper.prepare_tab."""
+        page = await CdpPage.open(self.connection)
+        await page.set_geolocation(geolocation)
+        blocked = RESOURCE_POLICIES[self.resource_policy]
+        if blocked:
+            await page.block_urls(blocked)
+        return page
+
+    async def close(self):
+        if self.connection is not None:
+            try:
+                await self.connection.close()
+            except Exception as e:
+                print(f"Error closing DevTools connection: {e}")
+            self.connection = None
+        if self.process is not None:
+            if self.process.returncode is None:
+                self.process.terminate()
+                try:
+                    await asyncio.wait_for(self.process.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    self.process.kill()
+                    await self.process.wait()
+            self.process = None
+        if self._stderr_drain is not None:
+            self._stderr_drain.cancel()
+            self._stderr_drain = None
+        if self._profile_dir is not None:
+            shutil.rmtree(self._profile_dir, ignore_errors=True)
+            self._profile_dir = None
+
+
+async def _search_keyword(page, keyword, run, controller, location):
+    """Awaitable scraper._search_keyword for direct navigation; errors become error records."""
+    try:
+        # Slots are claimed right away and waited out on the loop, no thread sleeps through them
+        if controller is not None:
+            await asyncio.sleep(controller.reserve())
+        await asyncio.sleep(run.rate_limiter.reserve())
+        await asyncio.sleep(run.pacing.delay("before_search"))
+        started = time.perf_counter()
+        await page.navigate(build_search_url(keyword, base_url=run.base_url, **location["locale"]))
+        navigated = time.perf_counter()
+        state = await page.wait_for_page_state()
+        if run.archive is not None:
+            _capture(run, await page.html(), keyword, location, state)
+        return _page_result(keyword, run, state, _search_timings(run, started, navigated, state))
+    except Exception as e:
+        print(f"⚠️ Error on '{keyword}': {e}")
+        return _error_result(keyword, run, e)
+
+
+async def _page_worker(name, chrome, scheduler, run, idle_wait, waiting, persistence):
+    """
+    Pull batches until the scheduler is drained, each batch in a brand-new page and context.
+    An idle page blocks on the scheduler for up to `idle_wait` seconds on the `waiting`
+    executor; results are settled on `persistence`, as journal, cache and sink writes block.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        # Off the loop: the wait blocks, and running dry may make it refill the scheduler from a feed
+        item = await loop.run_in_executor(waiting, scheduler.get, idle_wait)
+        if item is None:
+            if scheduler.finished():
+                return
+            continue
+
+        batch = _Batch(run, scheduler, item)
+        location = batch.location
+        page = None
+
+        print(f"\n🚀 [page {name}] {batch.label}: {len(batch.items)} keywords in {location['name']} "
+              f"as {batch.identity}")
+        try:
+            await chrome.ensure_started()
+            page = await chrome.new_page(location["geolocation"])
+            with run.metrics.span("cookie_load"):
+                cookies = batch.session.cookies if batch.session is not None else read_pickled_cookies()
+                await page.set_cookies(cookies, run.base_url)
+            await asyncio.sleep(run.pacing.delay("batch_start"))
+
+            while not batch.searched:
+                result = await _search_keyword(page, batch.next()[1], run, batch.controller, location)
+                await loop.run_in_executor(persistence, batch.settle, result)
+        except Exception as e:
+            print(f"⚠️ [page {name}] {batch.label} aborted: {e}")
+            await loop.run_in_executor(persistence, batch.abort, e)
+        finally:
+            try:
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception as e:
+                        print(f"Error closing page: {e}")
+            finally:
+                batch.finish(f"page {name}")
+
+        if scheduler.has_queued():
+            await asyncio.sleep(run.pacing.delay("between_batches"))
+
+
+async def run_cdp_workers(scheduler, run, browsers=1, pages=1, idle_wait=1.0):
+    """Drain `scheduler` with `browsers` Chrome processes of `pages` concurrent pages each."""
+    chromes = [AsyncChrome(resource_policy=run.resource_policy, metrics=run.metrics) for _ in range(browsers)]
+    # A thread per page to wait on the scheduler in, so idle pages never starve the default pool
+    waiting = ThreadPoolExecutor(max_workers=browsers * pages, thread_name_prefix="cdp-scheduler")
+    # One thread settles every result in order, off the loop that polls the pages
+    persistence = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cdp-persistence")
+    try:
+        await asyncio.gather(*(
+            _page_worker(f"{b}.{p}", chrome, scheduler, run, idle_wait, waiting, persistence)
+            for b, chrome in enumerate(chromes)
+            for p in range(pages)
+        ))
+    finally:
+        await asyncio.gather(*(chrome.close() for chrome in chromes), return_exceptions=True)
+        waiting.shutdown(wait=True)
+        persistence.shutdown(wait=True)
@@ -0,0 +1,218 @@
+# http_fetch.py
+"""
+Browserless first tier of ai_overview_detector(http_tier=HttpFetcher()).
+
+Every pending keyword is first fetched with plain HTTP over a pooled
+requests.Session carrying the stored login cookies, and the response is
+classified by serp_parser with BotDetector's selectors. Only pages that
+stay ambiguous go on to the browsers, batched as they come in so the
+browsers start on them while the rest is still being fetched:
+
+- an overview in the served HTML is final;
+- a results page without one is final only with `trust_results`
+  (--trust-http-results), since Google may render the overview later with
+  JavaScript; by default the browser confirms every "no overview";
+- captchas, HTTP errors and unknown markup always escalate, because the
+  browser gets its own chance under the run's RetryPolicy.
+
+The HTTP client cannot emulate a location's geolocation override; its
+searches carry the location's hl/gl only and Google places them by IP.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from serp_parser import classify_html
+from scraper import (
+    BotDetector, PAGE_STATE_CAPTCHA, PAGE_STATE_OVERVIEW, PAGE_STATE_RESULTS, _capture, _page_result,
+    _settle_attempt, build_search_url, read_pickled_cookies,
+)
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/120.0.0.0 Safari/537.36")
+
+
+class _Escalations:
+    """Groups escalated units into per-location batches of 3-8, handing each to `schedule` once full."""
+
+    def __init__(self, locations, schedule, min_size=3, max_size=8):
+        self.schedule = schedule
+        self.min_size = min_size
+        self.max_size = max_size
+        self.count = 0
+        self._batches = [[] for _ in range(locations)]
+        self._sizes = [random.randint(min_size, max_size) for _ in range(locations)]
+
+    def add(self, unit):
+        self.count += 1
+        location = unit[0] % len(self._batches)
+        batch = self._batches[location]
+        batch.append(unit)
+        if len(batch) >= self._sizes[location]:
+            self._batches[location] = []
+            self._sizes[location] = random.randint(self.min_size, self.max_size)
+            self.schedule(batch)
+
+    def flush(self):
+        for location, batch in enumerate(self._batches):
+            if batch:
+                self._batches[location] = []
+                self.schedule(batch)
+
+
+class HttpFetcher:
+    """
+    Settles what it can of a run without a browser and hands the rest on.
+
+    `concurrency` fetches run at once over one keep-alive connection pool.
+    After `max_captchas` captchas in a row the HTTP client counts as flagged
+    and keywords go straight to the browsers for the next `cooldown` seconds.
+    """
+
+    def __init__(self, concurrency=8, timeout=(5, 15), trust_results=False, max_captchas=3, cooldown=600.0,
+                 cookie_file="cookies.pkl"):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.trust_results = trust_results
+        self.max_captchas = max_captchas
+        self.cooldown = cooldown
+        self.cookie_file = cookie_file
+        self._captchas = 0
+        self._flagged_until = 0.0
+        self._lock = threading.Lock()
+
+    def open_session(self, cookies):
+        """A requests.Session with a connection pool sized for `concurrency` and the given WebDriver cookies."""
+        http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        http.mount("http://", adapter)
+        http.mount("https://", adapter)
+        http.headers["User-Agent"] = USER_AGENT
+        for cookie in cookies:
+            http.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain", ""), path=cookie.get("path", "/"),
+                secure=bool(cookie.get("secure")), expires=cookie.get("expiry"),
+            )
+        return http
+
+    def classify(self, response):
+        """BotDetector verdict of a fetched page; a 429 or a redirect to /sorry/ is a captcha whatever the markup."""
+        if response.status_code == 429 or "/sorry/" in response.url:
+            return {"verdict": PAGE_STATE_CAPTCHA, "selector": f"http:{response.status_code}", "text": None,
+                    "elapsed_ms": 0.0}
+        return classify_html(response.text, BotDetector.selector_groups())
+
+    def is_final(self, page):
+        """Whether the HTTP verdict settles the keyword, or the browser has to look."""
+        if page["verdict"] == PAGE_STATE_OVERVIEW:
+            return True
+        return page["verdict"] == PAGE_STATE_RESULTS and self.trust_results
+
+    def settle(self, run, units, schedule):
+        """
+        Fetch `units` ((index, keyword, attempt)) over HTTP and persist every final
+        result. The units left for the browsers are handed to `schedule` in
+        per-location batches as they fill up; returns how many were escalated.
+        """
+        escalations = _Escalations(len(run.locations), schedule)
+        checked = set()
+        try:
+            if units and not self.flagged:
+                self._fetch(run, units, escalations, checked)
+        except Exception as e:
+            print(f"🌐 HTTP tier stopped ({e}), handing the rest to the browser")
+        finally:
+            for unit in units:
+                if unit[0] not in checked:
+                    escalations.add(unit)
+            escalations.flush()
+        return escalations.count
+
+    def _fetch(self, run, units, escalations, checked):
+        session = run.sessions.acquire() if run.sessions is not None else None
+        # Without stored sessions the legacy cookie file is the one identity
+        cookies = session.cookies if session is not None else read_pickled_cookies(self.cookie_file)
+        identity = (session.name if session is not None else self.cookie_file) + " (http)"
+        controller = run.rate_controllers.get(identity) if run.rate_controllers else None
+        http = self.open_session(cookies)
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="http-tier") as pool:
+                futures = {pool.submit(self._check, run, http, controller, unit): unit for unit in units}
+                for future in as_completed(futures):
+                    unit = futures[future]
+                    checked.add(unit[0])
+                    try:
+                        escalated = future.result() is not None
+                    except Exception as e:
+                        print(f"🌐 HTTP check of '{unit[1]}' failed ({e}), handing it to the browser")
+                        escalated = True
+                    if escalated:
+                        escalations.add(unit)
+        finally:
+            http.close()
+            if run.sessions is not None:
+                run.sessions.release(session)
+
+    @property
+    def flagged(self):
+        with self._lock:
+            return time.monotonic() < self._flagged_until
+
+    def _check(self, run, http, controller, unit):
+        """Fetch and classify one unit; returns it when it needs the browser, None once persisted."""
+        index, keyword, attempt = unit
+        if self.flagged:
+            run.metrics.inc("http_escalated")
+            return unit
+        location = run.location_of(index)
+        if controller is not None:
+            controller.acquire()
+        run.rate_limiter.acquire()
+        started = time.perf_counter()
+        try:
+            response = http.get(build_search_url(keyword, base_url=run.base_url, **location["locale"]),
+                                timeout=self.timeout)
+            fetched = time.perf_counter()
+            page = self.classify(response)
+        except requests.RequestException as e:
+            print(f"🌐 HTTP fetch of '{keyword}' failed ({e}), handing it to the browser")
+            run.metrics.inc("http_escalated")
+            return unit
+        page["round_trip_ms"] = (time.perf_counter() - fetched) * 1000
+        run.metrics.inc("http_fetches")
+        run.metrics.observe("navigation", fetched - started)
+        # The parse is all the waiting a fetched page needs; classification is a sub-phase of it
+        run.metrics.observe("wait_for_state", page["round_trip_ms"] / 1000)
+        run.metrics.observe("classification", page["round_trip_ms"] / 1000)
+
+        with self._lock:
+            if page["verdict"] != PAGE_STATE_CAPTCHA:
+                self._captchas = 0
+            elif self.max_captchas and time.monotonic() >= self._flagged_until:
+                # Fetches already in flight when the client got flagged do not flag it again
+                self._captchas += 1
+                if self._captchas >= self.max_captchas:
+                    self._captchas = 0
+                    self._flagged_until = time.monotonic() + self.cooldown
+                    print(f"🌐 {self.max_captchas} captchas in a row over HTTP, "
+                          f"sending keywords to the browser for {self.cooldown:.0f}s")
+        if controller is not None and response.status_code < 500:
+            controller.record(captcha=page["verdict"] == PAGE_STATE_CAPTCHA)
+        if response.status_code >= 400 or not self.is_final(page):
+            run.metrics.inc("http_escalated")
+            return unit
+
+        if run.archive is not None:
+            _capture(run, response.text, keyword, location, page)
+        timings = {"navigate": (fetched - started) * 1000, "wait_for_state": 0.0, "classify": page["round_trip_ms"]}
+        result = _page_result(keyword, run, page, timings)
+        result["navigation"] = "http"
+        run.metrics.inc("http_settled")
+        _settle_attempt(run, index, keyword, attempt, result, [])
+        return None
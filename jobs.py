@@ -0,0 +1,243 @@
+# jobs.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from journal import ScrapeJournal
+from keywords import SpreadsheetSource
+from metrics import METRICS, Metrics
+from result_cache import ResultCache
+from scraper import KEYWORDS_SHEET_URL, ai_overview_detector
+from sinks import JsonlSink, ResultSink
+from webhook_sink import WebhookSink
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class Job:
+    """One detector run requested over the API, with its progress and results so far."""
+
+    def __init__(self, keywords=None, sheet_url=None, new_only=False, webhooks=(), options=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.keywords = keywords
+        self.sheet_url = sheet_url
+        self.new_only = new_only
+        self.webhooks = list(webhooks)
+        self.options = options or {}
+        self.status = JOB_QUEUED
+        # One result per keyword and location
+        self.per_keyword = len(self.options.get("locations") or ()) or 1
+        self.total = len(keywords) * self.per_keyword if keywords is not None else None
+        self.results = []
+        self.error = None
+        self.metrics = Metrics(parent=METRICS, keep_samples=True)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def add_result(self, result):
+        with self._lock:
+            self.results.append(result)
+
+    def results_since(self, cursor):
+        """Results that arrived after the first `cursor` ones."""
+        with self._lock:
+            return self.results[cursor:]
+
+    def progress(self):
+        with self._lock:
+            done = len(self.results)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": done,
+            "overviews": sum(1 for r in self.results[:done] if r["detected"]),
+            "bot_detected": sum(1 for r in self.results[:done] if r["bot_detected"]),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobSink(ResultSink):
+    """Feeds detector results into a Job as they settle, for progress and streaming."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def write(self, result):
+        self.job.add_result(result)
+
+
+class JobManager:
+    """
+    Runs jobs on a background thread pool so Selenium never blocks the event loop.
+    Jobs beyond `max_concurrent` wait in the executor's queue. Results of
+    every job are also pushed to `webhooks` (default: the comma-separated
+    WEBHOOK_URLS environment variable) plus the job's own ones. Jobs share
+    one ResultCache as `cache` (default: the RESULT_CACHE_DB file), so a
+    keyword already checked today is not searched again unless the job
+    asks for `force_refresh`. Finished jobs are forgotten `finished_ttl`
+    seconds after they end, and beyond the `max_finished` most recent ones;
+    their result files stay in `results_dir`.
+
+    Each job is journaled in `results_dir` next to a spec of its request,
+    which is deleted once the job completes; `resume_unfinished` submits the
+    jobs of any spec a killed process left behind again, and their journals
+    pick up where they stopped.
+    """
+
+    def __init__(self, max_concurrent=None, results_dir="job_results", snapshot_dir="keyword_snapshots",
+                 webhooks=None, cache=None, finished_ttl=None, max_finished=None):
+        max_concurrent = max_concurrent or int(os.getenv("MAX_CONCURRENT_JOBS", "1"))
+        self.finished_ttl = finished_ttl or float(os.getenv("FINISHED_JOB_TTL", "86400"))
+        self.max_finished = max_finished or int(os.getenv("MAX_FINISHED_JOBS", "200"))
+        self.results_dir = results_dir
+        self.snapshot_dir = snapshot_dir
+        if webhooks is None:
+            webhooks = [url.strip() for url in os.getenv("WEBHOOK_URLS", "").split(",") if url.strip()]
+        self.webhooks = webhooks
+        self.cache = cache or ResultCache(os.getenv("RESULT_CACHE_DB", "ai_overview_cache.sqlite3"))
+        self.jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="job")
+
+    def submit(self, keywords=None, sheet_url=None, new_only=False, webhooks=None, **options):
+        job = Job(keywords=keywords, sheet_url=sheet_url, new_only=new_only,
+                  webhooks=list(dict.fromkeys(self.webhooks + list(webhooks or ()))), options=options)
+        self._start(job)
+        return job
+
+    def resume_unfinished(self):
+        """Submit the jobs a previous process left unfinished again, under their old ids."""
+        if not os.path.isdir(self.results_dir):
+            return []
+        resumed = []
+        for name in sorted(os.listdir(self.results_dir)):
+            if not name.endswith(".job.json"):
+                continue
+            try:
+                with open(os.path.join(self.results_dir, name), encoding="utf-8") as f:
+                    spec = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not read job spec {name}: {e}")
+                continue
+            job = Job(keywords=spec["keywords"], sheet_url=spec["sheet_url"], new_only=spec["new_only"],
+                      webhooks=spec["webhooks"], options=spec["options"], job_id=spec["id"])
+            job.created_at = spec["created_at"]
+            print(f"📒 Resuming job {job.id}")
+            self._start(job)
+            resumed.append(job)
+        return resumed
+
+    def _start(self, job):
+        self._save_spec(job)
+        with self._jobs_lock:
+            self._evict()
+            self.jobs[job.id] = job
+        self._executor.submit(self._run, job)
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.results_dir, f"{job_id}.{suffix}")
+
+    def _save_spec(self, job):
+        os.makedirs(self.results_dir, exist_ok=True)
+        spec = {"id": job.id, "keywords": job.keywords, "sheet_url": job.sheet_url, "new_only": job.new_only,
+                "webhooks": job.webhooks, "options": job.options, "created_at": job.created_at}
+        try:
+            text = json.dumps(spec, ensure_ascii=False)
+        except TypeError as e:
+            # Options such as a PacingPolicy object only come from Python callers, not the API
+            print(f"⚠️ Job {job.id} cannot be resumed after a restart: {e}")
+            return
+        path = self._path(job.id, "job.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+
+    def _forget_spec(self, job):
+        try:
+            os.remove(self._path(job.id, "job.json"))
+        except FileNotFoundError:
+            pass
+
+    def get(self, job_id):
+        with self._jobs_lock:
+            self._evict()
+            return self.jobs.get(job_id)
+
+    def _evict(self):
+        """Forget finished jobs past `finished_ttl`, then the oldest beyond `max_finished`."""
+        now = time.time()
+        finished = sorted((job for job in self.jobs.values() if job.finished_at is not None),
+                          key=lambda job: job.finished_at)
+        kept = [job for job in finished if now - job.finished_at <= self.finished_ttl]
+        evicted = [job for job in finished if now - job.finished_at > self.finished_ttl]
+        evicted += kept[:max(0, len(kept) - self.max_finished)]
+        for job in evicted:
+            del self.jobs[job.id]
+
+    def _run(self, job):
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        try:
+            keywords = job.keywords
+            source = diff = None
+            if keywords is None:
+                source = self.sheet_source(job.sheet_url or KEYWORDS_SHEET_URL)
+                diff = source.fetch()
+                keywords = diff.added if job.new_only else diff.keywords
+                print(f"✅ [job {job.id}] Loaded {len(keywords)} keywords from Google Sheet ({diff}).")
+                # A resumed job must search the same list, or its journal would not match
+                job.keywords = keywords
+                self._save_spec(job)
+            job.total = len(keywords) * job.per_keyword
+
+            sinks = [
+                JobSink(job),
+                JsonlSink(pattern=os.path.join(self.results_dir, f"{job.id}_part{{part}}.jsonl")),
+            ]
+            if job.webhooks:
+                sinks.append(WebhookSink(job.webhooks))
+            results = ai_overview_detector(keywords, sinks=sinks, metrics=job.metrics, cache=self.cache,
+                                           journal=ScrapeJournal(self._path(job.id, "journal.jsonl")),
+                                           **job.options)
+            if source is not None:
+                source.save_snapshot(diff)
+            # A worker that died mid-batch leaves holes, which the journal fills on the next start
+            if all(r is not None for r in results):
+                self._forget_spec(job)
+            job.status = JOB_DONE
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = JOB_FAILED
+            self._forget_spec(job)
+        finally:
+            job.finished_at = time.time()
+
+    def sheet_source(self, csv_url):
+        """SpreadsheetSource with a snapshot file of its own for every sheet URL."""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        name = hashlib.sha1(csv_url.encode("utf-8")).hexdigest()
+        return SpreadsheetSource(csv_url, state_path=os.path.join(self.snapshot_dir, f"{name}.json"))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.cache.close()
@@ -0,0 +1,117 @@
+# journal.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+
+class ScrapeJournal:
+    """
+    Append-only JSONL journal of a detector run, so a crashed or killed run
+    resumes where it stopped instead of searching everything again.
+
+    The first line is a header with the run id and a fingerprint of the keyword
+    list, then one {"index", "result"} line per settled keyword, and a final
+    {"finished": true} line once the run completes. Every record is flushed to
+    the OS as it is written, so a killed process loses nothing; the fsync that
+    guards against a power loss is batched to every `fsync_every` lines or
+    `fsync_interval` seconds.
+    """
+
+    def __init__(self, path="scrape_journal.jsonl", fsync_every=20, fsync_interval=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.run_id = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @staticmethod
+    def fingerprint(keywords):
+        return hashlib.sha256("\n".join(keywords).encode("utf-8")).hexdigest()
+
+    def open(self, keywords):
+        """
+        Start journaling a run over `keywords`.
+
+        Returns:
+            dict: index -> result of every keyword an unfinished run over the
+            same keyword list already settled (empty for a fresh run)
+        """
+        fingerprint = self.fingerprint(keywords)
+        header, done, finished, valid_bytes = self._read()
+
+        if header and header.get("fingerprint") == fingerprint and not finished:
+            self.run_id = header["run_id"]
+            # Cut off a line torn by the crash before appending to it
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+            self._file = open(self.path, "a", encoding="utf-8")
+            print(f"📒 Resuming run {self.run_id}: {len(done)}/{len(keywords)} keywords already done")
+            return done
+
+        self.run_id = uuid.uuid4().hex
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({"run_id": self.run_id, "fingerprint": fingerprint, "size": len(keywords), "started_at": time.time()})
+        self._sync()
+        return {}
+
+    def _read(self):
+        """Parse an existing journal, stopping at the first torn or corrupt line."""
+        header, done, finished, valid_bytes = None, {}, False, 0
+        if not os.path.exists(self.path):
+            return header, done, finished, valid_bytes
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    break
+                valid_bytes += len(raw)
+                if header is None:
+                    header = entry
+                elif entry.get("finished"):
+                    finished = True
+                else:
+                    done[entry["index"]] = entry["result"]
+        return header, done, finished, valid_bytes
+
+    def record(self, index, result):
+        """Append the outcome of the keyword at `index`."""
+        with self._lock:
+            self._write({"index": index, "result": result})
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def finish(self):
+        """Mark the run complete so the next start does not resume it."""
+        with self._lock:
+            self._write({"finished": True, "finished_at": time.time()})
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """Flush and close without finishing, e.g. when the run is interrupted."""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
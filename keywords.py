@@ -0,0 +1,109 @@
+# keywords.py
+
+import csv
+import json
+import os
+import re
+import unicodedata
+
+import requests
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Canonical form of a keyword: NFKC, case-folded, single spaces, no outer whitespace."""
+    keyword = unicodedata.normalize("NFKC", keyword)
+    return re.sub(r"\s+", " ", keyword).strip().casefold()
+
+
+def dedupe_keywords(keywords):
+    """First spelling of every distinct keyword, in order; blank ones are dropped."""
+    seen = set()
+    unique = []
+    for keyword in keywords:
+        key = normalize_keyword(keyword)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(" ".join(keyword.split()))
+    return unique
+
+
+class KeywordDiff:
+    """Keywords of the current sheet, split against the previous snapshot."""
+
+    def __init__(self, keywords, previous, not_modified=False, etag=None, last_modified=None):
+        previous_keys = {normalize_keyword(k) for k in previous}
+        current_keys = {normalize_keyword(k) for k in keywords}
+        self.keywords = keywords
+        self.added = [k for k in keywords if normalize_keyword(k) not in previous_keys]
+        self.removed = [k for k in previous if normalize_keyword(k) not in current_keys]
+        self.not_modified = not_modified
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def __repr__(self):
+        return (f"KeywordDiff(total={len(self.keywords)}, added={len(self.added)}, "
+                f"removed={len(self.removed)}, not_modified={self.not_modified})")
+
+
+class SpreadsheetSource:
+    """
+    Streams keywords from a Google Sheet CSV export.
+
+    With a `state_path`, the ETag / Last-Modified of the last export and its
+    keyword list are remembered, so an unchanged sheet costs one 304 round trip
+    and `fetch()` can tell which keywords are new since the last saved snapshot.
+    """
+
+    def __init__(self, csv_url, state_path=None, timeout=(10, 120), session=None, column=0, has_header=True):
+        self.csv_url = csv_url
+        self.state_path = state_path
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.column = column
+        self.has_header = has_header
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def fetch(self):
+        """Download the sheet unless it is unchanged and diff it against the snapshot."""
+        state = self._load_state()
+        previous = state.get("keywords", [])
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+        with self.session.get(self.csv_url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                print("✅ Keyword sheet unchanged since last snapshot")
+                return KeywordDiff(previous, previous, not_modified=True,
+                                   etag=state.get("etag"), last_modified=state.get("last_modified"))
+            response.raise_for_status()
+            response.encoding = response.encoding or "utf-8"
+            keywords = dedupe_keywords(self._read_column(response.iter_lines(decode_unicode=True)))
+            return KeywordDiff(keywords, previous,
+                               etag=response.headers.get("ETag"),
+                               last_modified=response.headers.get("Last-Modified"))
+
+    def _read_column(self, lines):
+        reader = csv.reader(lines)
+        if self.has_header:
+            next(reader, None)  # Skip the header row if there's one
+        for row in reader:
+            if len(row) > self.column and row[self.column].strip():
+                yield row[self.column]
+
+    def save_snapshot(self, diff):
+        """Remember `diff` as the baseline; call it once its keywords were processed."""
+        if not self.state_path:
+            return
+        state = {"etag": diff.etag, "last_modified": diff.last_modified, "keywords": diff.keywords}
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
@@ -1,64 +1,237 @@
-# from fastapi import FastAPI
-# from pydantic import BaseModel
-# from scraper import ai_overview_detector
+# main.py
+import argparse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
 
-# app = FastAPI()
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, model_validator
 
-# class KeywordsRequest(BaseModel) : 
-#     keywords: str
+from journal import ScrapeJournal
+from http_fetch import HttpFetcher
+from jobs import JobManager
+from metrics import METRICS
+from overview_history import OverviewHistory
+from rate_control import RateControllerPool
+from result_cache import ResultCache
+from retry_queue import RetryPolicy
+from serp_archive import SerpArchive
+from session_pool import SessionPool
+from sinks import XlsxSink
+from staleness import DailyBudget, DailyPlan, StalenessScheduler
+from webhook_sink import WebhookSink
+from scraper import ai_overview_detector
+from scraper import (
+    ENGINE_CDP, ENGINE_SELENIUM, ENGINES, KEYWORDS_SHEET_URL, LOCATIONS, NAVIGATION_DIRECT, NAVIGATION_MODES,
+    NAVIGATION_TYPING,
+)
 
-# @app.get("/")
-# async def read_root():
-#     return {"message": "Hello, World!"}
+job_manager = JobManager()
 
-# @app.post("/detect")
-# async def detect(request: KeywordsRequest):
-#     result = ai_overview_detector(request.keywords)
-#     return {"result": result}
 
-# main.py
-from fastapi import FastAPI
-from pydantic import BaseModel
-from scraper import ai_overview_detector
-from scraper import main
-from scraper import scrape_keywords_from_spreadsheet
-from scraper import save_results_to_excel
-from scraper import save_results_in_chunks
-from typing import List
+@asynccontextmanager
+async def lifespan(app):
+    job_manager.resume_unfinished()
+    yield
+    job_manager.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+STREAM_POLL_SECONDS = 0.5
+
 
-# app = FastAPI()
 class KeywordsRequest(BaseModel):
     keywords: List[str]
 
-# Try to load keywords from the spreadsheet
-try:
-    keywords = scrape_keywords_from_spreadsheet()
-    print(f"✅ Loaded {len(keywords)} keywords from Google Sheet.")
-    results = ai_overview_detector(keywords)
-    # save_results_in_chunks(results, chunk_size=100)
 
+class JobRequest(BaseModel):
+    keywords: Optional[List[str]] = None
+    sheet_url: Optional[str] = None
+    new_only: bool = False  # with sheet_url: only keywords added since the last finished job
+    workers: int = Field(1, ge=1)
+    tabs: int = Field(1, ge=1)  # concurrent tabs per Chrome, direct navigation only
+    engine: Literal[ENGINES] = ENGINE_SELENIUM
+    locations: Optional[List[Literal[tuple(LOCATIONS)]]] = None  # every keyword is searched from each
+    navigation: Literal[NAVIGATION_MODES] = NAVIGATION_TYPING
+    webhooks: Optional[List[str]] = None  # also receive the results in batches (see webhook_sink.py)
+    force_refresh: bool = False  # search keywords already checked today again instead of using the cache
+
+    @model_validator(mode="after")
+    def check_combination(self):
+        # Answered with a 422 here instead of failing the job once it runs
+        if self.navigation != NAVIGATION_DIRECT and (self.tabs > 1 or self.engine == ENGINE_CDP):
+            raise ValueError(f"tabs > 1 and the {ENGINE_CDP} engine need navigation '{NAVIGATION_DIRECT}'")
+        if self.locations and len(set(self.locations)) != len(self.locations):
+            raise ValueError("locations must not repeat")
+        return self
+
+
+@app.get("/")
+async def read_root():
+    return {"message": "Hello, World!"}
+
+
+@app.post("/jobs")
+async def create_job(request: JobRequest):
+    if not request.keywords and not request.sheet_url:
+        raise HTTPException(status_code=422, detail="Send either keywords or sheet_url")
+    job = job_manager.submit(
+        keywords=request.keywords,
+        sheet_url=request.sheet_url,
+        new_only=request.new_only,
+        workers=request.workers,
+        tabs=request.tabs,
+        engine=request.engine,
+        locations=request.locations,
+        navigation=request.navigation,
+        webhooks=request.webhooks,
+        force_refresh=request.force_refresh,
+    )
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/jobs/{job_id}")
+async def job_progress(job_id: str):
+    return _get_job(job_id).progress()
+
+
+@app.get("/jobs/{job_id}/summary")
+async def job_summary(job_id: str):
+    """JSON run summary: outcome counters and time spent per phase."""
+    return _get_job(job_id).metrics.summary()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint covering every run of this process."""
+    return PlainTextResponse(METRICS.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/jobs/{job_id}/results")
+async def job_results(job_id: str, format: str = "ndjson"):
+    """
+    Stream results as they settle: chunked NDJSON by default, or
+    Server-Sent Events with `?format=sse`. The stream ends with the job.
+    """
+    job = _get_job(job_id)
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=422, detail="format must be 'ndjson' or 'sse'")
+
+    async def stream():
+        cursor = 0
+        while True:
+            finished = job.finished
+            new_results = job.results_since(cursor)
+            cursor += len(new_results)
+            for result in new_results:
+                payload = json.dumps(result, ensure_ascii=False)
+                yield f"data: {payload}\n\n" if format == "sse" else payload + "\n"
+            if finished and not new_results:
+                break
+            if not new_results:
+                await asyncio.sleep(STREAM_POLL_SECONDS)
+        if format == "sse":
+            yield f"event: end\ndata: {json.dumps(job.progress())}\n\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
 
 
-except Exception as e:
-    print(f"❌ Failed to load keywords from spreadsheet: {e}")
-    keywords = []  # fallback value, or you can raise an error if preferred
+@app.post("/detect")
+async def detect(request: KeywordsRequest):
+    """Queue a job for the keywords and return its id, same as POST /jobs."""
+    job = job_manager.submit(keywords=request.keywords)
+    return {"job_id": job.id, "status": job.status}
 
 
+def _get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
 
-# @app.get("/")
-# async def read_root():
-#     return {"message": "Hello, World!"}
 
-# @app.post("/detect")
-# async def detect(request: KeywordsRequest):
-#     results = ai_overview_detector(request.keywords)
-#     simplified = [
-#         {
-#             "keyword": r["keyword"],
-#             "detected": r["detected"],
-#             "bot_detected": r.get("bot_detected", False)
-#         }
-#         for r in results
-#     ]
-#     return {"results": simplified}
+if __name__ == "__main__":
+    # Batch run over the Google Sheet, resuming an interrupted run if there is one
+    parser = argparse.ArgumentParser(description="Detect AI overviews for the keywords of the Google Sheet")
+    parser.add_argument("--new-only", action="store_true", help="only keywords added since the last finished run")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tabs", type=int, default=1,
+                        help="concurrent isolated tabs per Chrome (needs --navigation direct)")
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE_SELENIUM,
+                        help="cdp drives Chrome over the DevTools protocol from one event loop, without chromedriver")
+    parser.add_argument("--navigation", choices=NAVIGATION_MODES, default=NAVIGATION_TYPING)
+    parser.add_argument("--adaptive-rate", action="store_true",
+                        help="pace searches with an AIMD controller driven by captcha feedback")
+    parser.add_argument("--sessions", default="sessions",
+                        help="directory of stored login sessions; cookies.pkl is used while it is empty")
+    parser.add_argument("--locations", nargs="+", choices=tuple(LOCATIONS),
+                        help="search every keyword from each of these places in one pass")
+    parser.add_argument("--capture", metavar="DIR",
+                        help="archive every results page there for offline replay (see serp_archive.py)")
+    parser.add_argument("--history", metavar="DB",
+                        help="also record every overview into this history store (see overview_history.py)")
+    parser.add_argument("--daily-budget", type=int, metavar="SEARCHES",
+                        help="with --history: search the most stale keywords first, at most this many searches a day")
+    parser.add_argument("--webhook", action="append", metavar="URL",
+                        help="also push results in gzip'd batches to this URL (repeatable), e.g. an n8n webhook")
+    parser.add_argument("--http-first", action="store_true",
+                        help="fetch every keyword over plain HTTP first; only ambiguous pages open a browser")
+    parser.add_argument("--trust-http-results", action="store_true",
+                        help="with --http-first: take a served page without an overview as final instead of "
+                             "checking it in the browser, where JavaScript may still add one")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="searches per keyword before a captcha'd or errored one is left unknown")
+    parser.add_argument("--force-refresh", action="store_true",
+                        help="search keywords already checked today again instead of answering them from the cache")
+    args = parser.parse_args()
 
+    if args.daily_budget and not args.history:
+        parser.error("--daily-budget needs --history")
+    if args.trust_http_results and not args.http_first:
+        parser.error("--trust-http-results needs --http-first")
+    sinks = [XlsxSink()]
+    if args.webhook:
+        sinks.append(WebhookSink(args.webhook))
+    history = OverviewHistory(args.history) if args.history else None
+    if history is not None:
+        sinks.append(history.sink(label="sheet"))
+    budget = DailyBudget(args.daily_budget) if args.daily_budget else None
+    plan = DailyPlan() if budget is not None else None
+    if budget is not None:
+        sinks.append(budget.sink())
+    http_tier = HttpFetcher(trust_results=args.trust_http_results) if args.http_first else None
+    source = job_manager.sheet_source(KEYWORDS_SHEET_URL)
+    try:
+        diff = source.fetch()
+        keywords = diff.added if args.new_only else diff.keywords
+        print(f"✅ Loaded {len(keywords)} keywords from Google Sheet ({diff}).")
+        planned = plan.load() if plan is not None else None
+        if planned is not None:
+            keywords = planned
+            print(f"🎯 Resuming today's plan of {len(keywords)} keywords "
+                  f"({budget.remaining()} of {budget.daily_searches} searches left)")
+        elif budget is not None:
+            keywords = StalenessScheduler(history).plan(keywords, budget.remaining(),
+                                                        locations=args.locations or ("jakarta",))
+            plan.save(keywords)
+            print(f"🎯 Searching the {len(keywords)} most stale keywords within today's budget "
+                  f"({budget.remaining()} of {budget.daily_searches} searches left)")
+    except Exception as e:
+        print(f"❌ Failed to load keywords from spreadsheet: {e}")
+    else:
+        results = ai_overview_detector(keywords, workers=args.workers, tabs=args.tabs, engine=args.engine,
+                                       navigation=args.navigation, locations=args.locations,
+                                       archive=SerpArchive(args.capture) if args.capture else None,
+                                       http_tier=http_tier,
+                                       adaptive_rate=RateControllerPool() if args.adaptive_rate else None,
+                                       sessions=SessionPool(args.sessions),
+                                       retry=RetryPolicy(max_attempts=args.max_attempts),
+                                       cache=ResultCache(), force_refresh=args.force_refresh,
+                                       sinks=sinks, journal=ScrapeJournal(), summary_path="run_summary.json")
+        if plan is not None and all(r is not None for r in results):
+            plan.clear()
+        source.save_snapshot(diff)
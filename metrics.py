@@ -0,0 +1,115 @@
+# metrics.py
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Phases a keyword's wall-clock time is split into
+PHASES = ("driver_startup", "cookie_load", "navigation", "wait_for_state", "classification", "capture", "persistence")
+# Phases timed inside another one; left out of the total that shares are taken of
+SUB_PHASES = {"classification": "wait_for_state"}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Metrics:
+    """
+    Thread-safe counters and per-phase timing histograms.
+
+    A run keeps its own Metrics with raw samples for the JSON run summary and
+    forwards everything to `parent`, the process-wide registry behind /metrics.
+    """
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, parent=None, keep_samples=False):
+        self.parent = parent
+        self.keep_samples = keep_samples
+        self.started_at = time.time()
+        self.counters = {}
+        self._buckets = {}
+        self._sums = {}
+        self._counts = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        if self.parent is not None:
+            self.parent.inc(name, amount)
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            buckets = self._buckets.setdefault(phase, [0] * (len(self.BUCKETS) + 1))
+            buckets[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            self._sums[phase] = self._sums.get(phase, 0.0) + seconds
+            self._counts[phase] = self._counts.get(phase, 0) + 1
+            if self.keep_samples:
+                self._samples.setdefault(phase, []).append(seconds)
+        if self.parent is not None:
+            self.parent.observe(phase, seconds)
+
+    @contextmanager
+    def span(self, phase):
+        """Time the enclosed block as one observation of `phase`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - started)
+
+    def render_prometheus(self, prefix="ai_overview"):
+        """Text exposition format for a Prometheus scrape."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+            metric = f"{prefix}_phase_duration_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for phase in sorted(self._buckets):
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS + ("+Inf",), self._buckets[phase]):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{phase="{phase}"}} {self._sums[phase]}')
+                lines.append(f'{metric}_count{{phase="{phase}"}} {self._counts[phase]}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        JSON-ready run summary: counters plus count, total, share and percentiles per phase (ms).
+        Shares are of the time spent in top-level phases, so a SUB_PHASES entry is the
+        part of its parent's share it took rather than a slice of its own.
+        """
+        with self._lock:
+            total = sum(s for phase, s in self._sums.items() if phase not in SUB_PHASES) or 1.0
+            phases = {}
+            for phase in sorted(self._counts, key=lambda p: PHASES.index(p) if p in PHASES else len(PHASES)):
+                samples = [s * 1000 for s in self._samples.get(phase, [])]
+                phases[phase] = {
+                    "count": self._counts[phase],
+                    "total_ms": self._sums[phase] * 1000,
+                    "mean_ms": self._sums[phase] * 1000 / self._counts[phase],
+                    "share": self._sums[phase] / total,
+                    **({f"p{pct}_ms": percentile(samples, pct) for pct in (50, 90, 99)} if samples else {}),
+                }
+            return {
+                "started_at": self.started_at,
+                "elapsed_s": time.time() - self.started_at,
+                "counters": dict(self.counters),
+                "phases": phases,
+            }
+
+
+# Process-wide registry served on /metrics
+METRICS = Metrics()
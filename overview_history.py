@@ -0,0 +1,324 @@
+# overview_history.py
+"""
+History of AI overviews across runs, without keeping a spreadsheet per run.
+
+Overview texts are stored once per distinct body, zlib-compressed under the
+sha256 of the text. The per-keyword timeline only gets a row when a keyword
+changes state (gained, lost or changed its overview), so a keyword checked
+every day for a month with the same overview costs one row. `changes_since`
+finds its candidates through the timeline's run index and compares two
+indexed rows per keyword, without scanning the whole history:
+
+    python overview_history.py changes --days 7
+    python overview_history.py timeline "kopi susu" --location jakarta
+    python overview_history.py show 3fa4...
+"""
+
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+
+from keywords import normalize_keyword
+from sinks import ResultSink
+
+CHANGE_NEW = "new"
+CHANGE_GAINED = "gained"
+CHANGE_LOST = "lost"
+CHANGE_CHANGED = "changed"
+
+
+def overview_hash(text):
+    """Content address of an overview body; surrounding whitespace does not count as a change."""
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class OverviewHistory:
+    """
+    SQLite store of overview bodies and per-keyword timelines, fed through `sink()`.
+
+    Tables: runs (one row per detector run), bodies (hash -> compressed
+    text), timeline ((keyword, location, run) -> hash, detected; state
+    changes only) and latest (the current state and last check of every
+    keyword and location). Only settled results enter the timeline; a
+    captcha or error says nothing about the overview and only goes to
+    failures (the consecutive failed checks of a keyword, for scheduling).
+    Results answered from a ResultCache are skipped: they repeat a check
+    that was already recorded, and would make a keyword look fresher and
+    more often checked than it is.
+    """
+
+    def __init__(self, path="overview_history.sqlite3", compresslevel=6):
+        self.path = path
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY, started_at REAL NOT NULL, label TEXT);"
+            "CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);"
+            "CREATE TABLE IF NOT EXISTS bodies ("
+            " hash TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, first_run INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS timeline ("
+            " keyword TEXT NOT NULL, location TEXT NOT NULL, run INTEGER NOT NULL, hash TEXT,"
+            " detected INTEGER NOT NULL, PRIMARY KEY (keyword, location, run));"
+            "CREATE INDEX IF NOT EXISTS timeline_run ON timeline (run);"
+            "CREATE TABLE IF NOT EXISTS latest ("
+            " keyword TEXT NOT NULL, location TEXT NOT NULL, display TEXT NOT NULL, hash TEXT,"
+            " detected INTEGER NOT NULL, since_run INTEGER NOT NULL, last_run INTEGER NOT NULL,"
+            " checks INTEGER NOT NULL DEFAULT 1, PRIMARY KEY (keyword, location));"
+            "CREATE TABLE IF NOT EXISTS failures ("
+            " keyword TEXT NOT NULL, location TEXT NOT NULL, failures INTEGER NOT NULL, last_failure_at REAL NOT NULL,"
+            " kind TEXT NOT NULL, PRIMARY KEY (keyword, location));"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(latest)")}
+        if "checks" not in columns:
+            # Stores created before scheduling counted checks
+            self._conn.execute("ALTER TABLE latest ADD COLUMN checks INTEGER NOT NULL DEFAULT 1")
+        self._conn.commit()
+
+    def start_run(self, label=None, started_at=None):
+        """Register a run and return its id; runs are numbered in start order."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (started_at, label) VALUES (?, ?)",
+                (started_at if started_at is not None else time.time(), label),
+            )
+            self._conn.commit()
+        return cursor.lastrowid
+
+    def sink(self, run_id=None, label=None):
+        """ResultSink recording into `run_id`, or into a run started now."""
+        return HistorySink(self, run_id if run_id is not None else self.start_run(label))
+
+    def record(self, run_id, result):
+        """
+        Record one detector result of `run_id`.
+
+        Returns:
+            str: the CHANGE_* the result made to its keyword's timeline, or
+            None when nothing changed (or the result was not settled or
+            came from the cache)
+        """
+        if result.get("cached"):
+            return None
+        key = normalize_keyword(result["keyword"])
+        location = result.get("location") or ""
+        if result.get("bot_detected") or result.get("error"):
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO failures (keyword, location, failures, last_failure_at, kind) VALUES (?, ?, 1, ?, ?)"
+                    " ON CONFLICT (keyword, location) DO UPDATE SET failures = failures + 1,"
+                    " last_failure_at = excluded.last_failure_at, kind = excluded.kind",
+                    (key, location, time.time(), "error" if result.get("error") else "captcha"),
+                )
+                self._conn.commit()
+            return None
+        detected = bool(result["detected"])
+        text = (result.get("text") or "").strip() if detected else ""
+        digest = overview_hash(text) if text else None
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT hash, detected, last_run FROM latest WHERE keyword = ? AND location = ?", (key, location)
+            ).fetchone()
+            if previous is not None and previous[2] > run_id:
+                # A late result of an older run never overrides what a newer run saw
+                return None
+            change = _change(previous and (previous[0], bool(previous[1])), (digest, detected))
+            if digest is not None:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO bodies (hash, body, size, first_run) VALUES (?, ?, ?, ?)",
+                    (digest, zlib.compress(text.encode("utf-8"), self.compresslevel), len(text), run_id),
+                )
+            if change is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO timeline (keyword, location, run, hash, detected) VALUES (?, ?, ?, ?, ?)",
+                    (key, location, run_id, digest, detected),
+                )
+                self._conn.execute(
+                    "INSERT INTO latest (keyword, location, display, hash, detected, since_run, last_run)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (keyword, location) DO UPDATE SET"
+                    " display = excluded.display, hash = excluded.hash, detected = excluded.detected,"
+                    " since_run = excluded.since_run, last_run = excluded.last_run, checks = checks + 1",
+                    (key, location, result["keyword"], digest, detected, run_id, run_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE latest SET last_run = ?, checks = checks + 1 WHERE keyword = ? AND location = ?",
+                    (run_id, key, location),
+                )
+            self._conn.execute("DELETE FROM failures WHERE keyword = ? AND location = ?", (key, location))
+            self._conn.commit()
+        return change
+
+    def body(self, digest):
+        """Overview text stored under `digest`, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM bodies WHERE hash = ?", (digest,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def timeline(self, keyword, location=""):
+        """State changes of one keyword, oldest first: run, started_at, hash, detected."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.run, r.started_at, t.hash, t.detected FROM timeline t JOIN runs r ON r.id = t.run"
+                " WHERE t.keyword = ? AND t.location = ? ORDER BY t.run",
+                (normalize_keyword(keyword), location),
+            ).fetchall()
+        return [{"run": run, "started_at": started_at, "hash": digest, "detected": bool(detected)}
+                for run, started_at, digest, detected in rows]
+
+    def changes_since(self, since):
+        """
+        Keywords whose overview state differs now from what it was before `since` (a timestamp).
+
+        A keyword that flipped and flipped back within the window is not
+        reported; one first seen within it counts as CHANGE_NEW.
+
+        Returns:
+            dict: CHANGE_* -> [{keyword, location, hash, previous_hash}]
+        """
+        changes = {CHANGE_NEW: [], CHANGE_GAINED: [], CHANGE_LOST: [], CHANGE_CHANGED: []}
+        with self._lock:
+            first_run = self._conn.execute("SELECT MIN(id) FROM runs WHERE started_at >= ?", (since,)).fetchone()[0]
+            if first_run is None:
+                return changes
+            candidates = self._conn.execute(
+                "SELECT DISTINCT keyword, location FROM timeline WHERE run >= ?", (first_run,)
+            ).fetchall()
+            for key, location in candidates:
+                before = self._conn.execute(
+                    "SELECT hash, detected FROM timeline WHERE keyword = ? AND location = ? AND run < ?"
+                    " ORDER BY run DESC LIMIT 1",
+                    (key, location, first_run),
+                ).fetchone()
+                display, digest, detected = self._conn.execute(
+                    "SELECT display, hash, detected FROM latest WHERE keyword = ? AND location = ?", (key, location)
+                ).fetchone()
+                change = _change(before and (before[0], bool(before[1])), (digest, bool(detected)))
+                if change is not None:
+                    changes[change].append({
+                        "keyword": display,
+                        "location": location,
+                        "hash": digest,
+                        "previous_hash": before[0] if before else None,
+                    })
+        return changes
+
+    def keyword_states(self, location=""):
+        """
+        Check history of every keyword seen at `location`, for scheduling.
+
+        Returns:
+            dict: normalized keyword -> checks, flips (state changes after the
+            first check), first_checked_at, last_checked_at, failures
+            (consecutive failed checks since), last_failure_at and
+            last_failure ("captcha" or "error")
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT l.keyword, l.checks, t.changes - 1, t.first_checked_at, r.started_at"
+                " FROM latest l JOIN runs r ON r.id = l.last_run"
+                " JOIN (SELECT keyword, COUNT(*) AS changes, MIN(runs.started_at) AS first_checked_at"
+                "       FROM timeline JOIN runs ON runs.id = timeline.run WHERE location = ? GROUP BY keyword) t"
+                "   ON t.keyword = l.keyword"
+                " WHERE l.location = ?",
+                (location, location),
+            ).fetchall()
+            failures = self._conn.execute(
+                "SELECT keyword, failures, last_failure_at, kind FROM failures WHERE location = ?", (location,)
+            ).fetchall()
+        states = {
+            key: {"checks": checks, "flips": flips, "first_checked_at": first_checked_at,
+                  "last_checked_at": last_checked_at, "failures": 0, "last_failure_at": None, "last_failure": None}
+            for key, checks, flips, first_checked_at, last_checked_at in rows
+        }
+        for key, count, last_failure_at, kind in failures:
+            state = states.setdefault(key, {"checks": 0, "flips": 0, "first_checked_at": None,
+                                            "last_checked_at": None})
+            state.update(failures=count, last_failure_at=last_failure_at, last_failure=kind)
+        return states
+
+    def stats(self):
+        with self._lock:
+            runs, bodies, stored, raw, rows, keywords = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM runs), COUNT(*), COALESCE(SUM(LENGTH(body)), 0),"
+                " COALESCE(SUM(size), 0), (SELECT COUNT(*) FROM timeline), (SELECT COUNT(*) FROM latest)"
+                " FROM bodies"
+            ).fetchone()
+        return {"runs": runs, "bodies": bodies, "body_bytes": stored, "text_bytes": raw,
+                "timeline_rows": rows, "keywords": keywords}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _change(before, after):
+    """CHANGE_* between two (hash, detected) states, None when they are the same."""
+    if before is None:
+        return CHANGE_NEW
+    if before[1] != after[1]:
+        return CHANGE_GAINED if after[1] else CHANGE_LOST
+    if before[0] != after[0]:
+        return CHANGE_CHANGED
+    return None
+
+
+class HistorySink(ResultSink):
+    """Streams a run's settled results into an OverviewHistory."""
+
+    def __init__(self, history, run_id):
+        self.history = history
+        self.run_id = run_id
+        self.changes = {}
+
+    def write(self, result):
+        change = self.history.record(self.run_id, result)
+        if change is not None:
+            self.changes[change] = self.changes.get(change, 0) + 1
+
+    def close(self):
+        if self.changes:
+            print(f"🗃️ Overview history, run {self.run_id}: "
+                  + ", ".join(f"{count} {change}" for change, count in sorted(self.changes.items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the AI overview history")
+    parser.add_argument("--db", default="overview_history.sqlite3")
+    commands = parser.add_subparsers(dest="command", required=True)
+    changes = commands.add_parser("changes", help="keywords that gained, lost or changed their overview")
+    changes.add_argument("--days", type=float, default=7)
+    changes.add_argument("--show", type=int, default=20, help="keywords to list per kind of change")
+    timeline = commands.add_parser("timeline", help="state changes of one keyword")
+    timeline.add_argument("keyword")
+    timeline.add_argument("--location", default="jakarta")
+    show = commands.add_parser("show", help="print a stored overview body")
+    show.add_argument("hash")
+    commands.add_parser("stats")
+    args = parser.parse_args()
+
+    history = OverviewHistory(args.db)
+    try:
+        if args.command == "changes":
+            report = history.changes_since(time.time() - args.days * 86400)
+            for change, entries in report.items():
+                print(f"{change}: {len(entries)}")
+                for entry in entries[:args.show]:
+                    print(f"   {entry['keyword']!r} @ {entry['location']}")
+        elif args.command == "timeline":
+            for entry in history.timeline(args.keyword, args.location):
+                day = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["started_at"]))
+                state = f"overview {entry['hash']}" if entry["detected"] else "no overview"
+                print(f"run {entry['run']} ({day}): {state}")
+        elif args.command == "show":
+            body = history.body(args.hash)
+            print(body if body is not None else f"No overview stored under {args.hash}")
+        else:
+            print(history.stats())
+    finally:
+        history.close()
@@ -0,0 +1,215 @@
+# queue_worker.py
+"""
+Scraper node of a multi-node run: leases keywords from a shared WorkQueue,
+feeds them to one long-running ai_overview_detector, whose browsers stay warm
+from lease to lease, and completes them, until the queue is drained. Several nodes, each with its own sessions and IP, split one
+keyword list between them without searching a keyword twice:
+
+    python queue_worker.py enqueue sheet-2026-10 --sheet
+    python queue_worker.py work sheet-2026-10 --sessions sessions --workers 2
+    python queue_worker.py status sheet-2026-10
+    python queue_worker.py export sheet-2026-10 --format xlsx
+"""
+
+import argparse
+import os
+import socket
+import threading
+
+from http_fetch import HttpFetcher
+from keywords import dedupe_keywords
+from rate_control import RateControllerPool
+from result_cache import ResultCache
+from retry_queue import RetryPolicy
+from scraper import (
+    ENGINE_SELENIUM, ENGINES, KEYWORDS_SHEET_URL, LOCATIONS, NAVIGATION_MODES, NAVIGATION_TYPING, STATUS_UNKNOWN,
+    ai_overview_detector, scrape_keywords_from_spreadsheet,
+)
+from session_pool import SessionPool
+from sinks import CsvSink, JsonlSink, ResultSink, XlsxSink
+from work_queue import SqliteWorkQueue
+
+EXPORT_SINKS = {"xlsx": XlsxSink, "csv": CsvSink, "jsonl": JsonlSink}
+
+
+class QueueSink(ResultSink):
+    """
+    Completes leased items as their results settle, one result per location.
+
+    A keyword left "unknown" (every attempt captcha'd or errored) is released
+    instead, so another node with another IP gets a go, until it has been
+    delivered `max_deliveries` times; then "unknown" is its final answer.
+    """
+
+    def __init__(self, queue, owner, items=(), per_keyword=1, max_deliveries=3, release_delay=60.0):
+        self.queue = queue
+        self.owner = owner
+        self.per_keyword = per_keyword
+        self.max_deliveries = max_deliveries
+        self.release_delay = release_delay
+        self.completed = 0
+        self.released = 0
+        self._items = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self.add(items)
+
+    def add(self, items):
+        """Track newly leased items."""
+        with self._lock:
+            for item in items:
+                self._items[item["keyword"]] = item
+                self._results[item["keyword"]] = []
+
+    def write(self, result):
+        with self._lock:
+            item = self._items.get(result["keyword"])
+            if item is None:
+                return
+            results = self._results[item["keyword"]]
+            results.append(result)
+            if len(results) < self.per_keyword:
+                return
+            del self._items[item["keyword"]]
+            del self._results[item["keyword"]]
+        if any(r["status"] == STATUS_UNKNOWN for r in results) and item["deliveries"] < self.max_deliveries:
+            self.queue.release(self.owner, item["id"], delay=self.release_delay)
+            self.released += 1
+        elif self.queue.complete(self.owner, item["id"], results):
+            self.completed += 1
+        else:
+            print(f"⚠️ '{item['keyword']}' was already completed by another node after this lease ran out")
+
+    def unsettled(self):
+        """Ids of the leased items that have not settled yet."""
+        with self._lock:
+            return [item["id"] for item in self._items.values()]
+
+
+def _keep_leases(queue, owner, sink, lease_s, heartbeat_s, stop):
+    while not stop.wait(heartbeat_s):
+        item_ids = sink.unsettled()
+        held = queue.heartbeat(owner, item_ids, lease_s)
+        if held < len(item_ids):
+            print(f"⚠️ [{owner}] Lost the lease on {len(item_ids) - held} keyword(s); they may be searched twice")
+
+
+def run_queue_worker(queue, name, owner=None, batch_size=50, lease_s=300.0, heartbeat_s=60.0, max_deliveries=3,
+                     idle_poll_s=30.0, **detector_options):
+    """
+    Lease batches of `batch_size` keywords of `name` and search them until the queue is drained.
+
+    One ai_overview_detector runs for the whole time and leases the next
+    batch whenever its workers run dry, so browsers and sessions stay warm
+    from lease to lease. Leases last `lease_s` seconds and are extended
+    every `heartbeat_s` until their keywords settle; whatever is still
+    unsettled when the detector stops (it crashed) is released right away.
+    While other nodes hold the last leases, this node polls every
+    `idle_poll_s` seconds in case one of them dies. `detector_options` go
+    to ai_overview_detector.
+
+    Returns:
+        dict: keywords completed and released by this node
+    """
+    owner = owner or f"{socket.gethostname()}-{os.getpid()}"
+    per_keyword = len(detector_options.get("locations") or ()) or 1
+    sink = QueueSink(queue, owner, per_keyword=per_keyword, max_deliveries=max_deliveries)
+
+    def lease_more():
+        items = queue.lease(name, owner, batch_size, lease_s)
+        if not items:
+            stats = queue.stats(name)
+            if not stats["pending"] and not stats["leased"]:
+                print(f"🏁 [{owner}] Queue '{name}' is drained: {stats['done']} of {stats['total']} keywords done")
+                return None
+            print(f"⏳ [{owner}] {stats['leased']} keyword(s) still leased, "
+                  f"{stats['pending']} waiting; polling again in {idle_poll_s:.0f}s")
+            return []
+        redelivered = sum(1 for item in items if item["deliveries"] > 1)
+        print(f"📥 [{owner}] Leased {len(items)} keywords of '{name}'"
+              + (f" ({redelivered} delivered again)" if redelivered else ""))
+        sink.add(items)
+        return [item["keyword"] for item in items]
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_keep_leases, args=(queue, owner, sink, lease_s, heartbeat_s, stop),
+                                 name="lease-heartbeat", daemon=True)
+    heartbeat.start()
+    try:
+        ai_overview_detector([], sinks=[sink], feed=lease_more, feed_interval=idle_poll_s, **detector_options)
+    finally:
+        stop.set()
+        heartbeat.join()
+        for item_id in sink.unsettled():
+            queue.release(owner, item_id)
+    return {"completed": sink.completed, "released": sink.released}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split keyword runs over several scraper nodes")
+    parser.add_argument("--db", default=os.getenv("WORK_QUEUE_DB", "work_queue.sqlite3"),
+                        help="SQLite file shared by every node (env WORK_QUEUE_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="add keywords to a queue")
+    enqueue.add_argument("queue")
+    enqueue.add_argument("keywords", nargs="*")
+    enqueue.add_argument("--sheet", nargs="?", const=KEYWORDS_SHEET_URL, help="CSV export URL of a keyword sheet")
+
+    work = commands.add_parser("work", help="search keywords of a queue until it is drained")
+    work.add_argument("queue")
+    work.add_argument("--node", help="name of this node in the leases (default: host-pid)")
+    work.add_argument("--batch-size", type=int, default=50)
+    work.add_argument("--lease", type=float, default=300.0, help="seconds a lease lasts without a heartbeat")
+    work.add_argument("--workers", type=int, default=1)
+    work.add_argument("--tabs", type=int, default=1)
+    work.add_argument("--engine", choices=ENGINES, default=ENGINE_SELENIUM)
+    work.add_argument("--navigation", choices=NAVIGATION_MODES, default=NAVIGATION_TYPING)
+    work.add_argument("--locations", nargs="+", choices=tuple(LOCATIONS))
+    work.add_argument("--sessions", default=os.getenv("SESSIONS_DIR", "sessions"))
+    work.add_argument("--adaptive-rate", action="store_true")
+    work.add_argument("--http-first", action="store_true")
+    work.add_argument("--trust-http-results", action="store_true",
+                      help="with --http-first: take a served page without an overview as final")
+    work.add_argument("--max-attempts", type=int, default=3)
+    work.add_argument("--cache", default=os.getenv("RESULT_CACHE_DB", "ai_overview_cache.sqlite3"),
+                      help="answer keywords this node already checked today from this file (env RESULT_CACHE_DB)")
+    work.add_argument("--force-refresh", action="store_true", help="search cached keywords again")
+
+    status = commands.add_parser("status", help="show the progress of a queue")
+    status.add_argument("queue")
+
+    export = commands.add_parser("export", help="write the results of a queue, in keyword order")
+    export.add_argument("queue")
+    export.add_argument("--format", choices=tuple(EXPORT_SINKS), default="xlsx")
+    args = parser.parse_args()
+
+    work_queue = SqliteWorkQueue(args.db)
+    try:
+        if args.command == "enqueue":
+            keywords = list(args.keywords)
+            if args.sheet:
+                keywords += scrape_keywords_from_spreadsheet(args.sheet)
+            keywords = dedupe_keywords(keywords)
+            added = work_queue.enqueue(args.queue, keywords)
+            print(f"✅ Queued {added} of {len(keywords)} keywords in '{args.queue}' (the rest were already there)")
+        elif args.command == "work":
+            run_queue_worker(
+                work_queue, args.queue, owner=args.node, batch_size=args.batch_size, lease_s=args.lease,
+                heartbeat_s=args.lease / 5, workers=args.workers, tabs=args.tabs, engine=args.engine,
+                navigation=args.navigation, locations=args.locations, sessions=SessionPool(args.sessions),
+                adaptive_rate=RateControllerPool() if args.adaptive_rate else None,
+                http_tier=HttpFetcher(trust_results=args.trust_http_results) if args.http_first else None,
+                retry=RetryPolicy(max_attempts=args.max_attempts),
+                cache=ResultCache(args.cache), force_refresh=args.force_refresh,
+            )
+        elif args.command == "status":
+            print(work_queue.stats(args.queue))
+        else:
+            results = work_queue.results(args.queue)
+            with EXPORT_SINKS[args.format](pattern=f"{args.queue}_part{{part}}.{args.format}") as sink:
+                for result in results:
+                    sink.write(result)
+            print(f"✅ Exported {len(results)} results of '{args.queue}'")
+    finally:
+        work_queue.close()
@@ -0,0 +1,102 @@
+# rate_control.py
+
+import threading
+import time
+
+
+class AdaptiveRateController:
+    """
+    AIMD pacing of the searches made with one session/identity.
+
+    The rate (searches per minute) grows by `increase_rpm` after every
+    `window` clean searches and is multiplied by `decrease_factor` on every
+    captcha, always staying within [min_rpm, max_rpm]. After a decrease the
+    rate holds for a full window before it may grow again, so one lucky
+    streak right after a captcha does not push straight back to the limit.
+    """
+
+    def __init__(self, initial_rpm=6.0, min_rpm=1.0, max_rpm=60.0, increase_rpm=1.0,
+                 decrease_factor=0.5, window=10, name="default"):
+        self.rpm = min(max(initial_rpm, min_rpm), max_rpm)
+        self.min_rpm = min_rpm
+        self.max_rpm = max_rpm
+        self.increase_rpm = increase_rpm
+        self.decrease_factor = decrease_factor
+        self.window = window
+        self.name = name
+        self.searches = 0
+        self.captchas = 0
+        self._clean_streak = 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Claim this identity's next slot without blocking; returns the seconds to wait before searching."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 60.0 / self.rpm
+        return slot - now
+
+    def acquire(self):
+        """Block until this identity may search again at the current rate."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, captcha):
+        """Feed back the outcome of one search."""
+        with self._lock:
+            self.searches += 1
+            if captcha:
+                self.captchas += 1
+                self._clean_streak = 0
+                old_rpm = self.rpm
+                self.rpm = max(self.min_rpm, self.rpm * self.decrease_factor)
+                # Push the next slot out to the slower spacing right away
+                self._next_slot = max(self._next_slot, time.monotonic() + 60.0 / self.rpm)
+                print(f"🐢 [{self.name}] Captcha, rate {old_rpm:.1f} -> {self.rpm:.1f}/min")
+                return
+            self._clean_streak += 1
+            if self._clean_streak >= self.window and self.rpm < self.max_rpm:
+                self._clean_streak = 0
+                self.rpm = min(self.max_rpm, self.rpm + self.increase_rpm)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rpm": self.rpm,
+                "searches": self.searches,
+                "captchas": self.captchas,
+                "captcha_rate": self.captchas / self.searches if self.searches else 0.0,
+            }
+
+
+class RateControllerPool:
+    """
+    One AdaptiveRateController per identity, created on first use.
+    `defaults` apply to every identity; `configure` overrides them for one.
+    """
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self._settings = {}
+        self._controllers = {}
+        self._lock = threading.Lock()
+
+    def configure(self, identity, **settings):
+        with self._lock:
+            self._settings[identity] = settings
+            self._controllers.pop(identity, None)
+
+    def get(self, identity):
+        with self._lock:
+            if identity not in self._controllers:
+                settings = {**self.defaults, **self._settings.get(identity, {})}
+                self._controllers[identity] = AdaptiveRateController(name=str(identity), **settings)
+            return self._controllers[identity]
+
+    def stats(self):
+        with self._lock:
+            controllers = dict(self._controllers)
+        return {identity: controller.stats() for identity, controller in controllers.items()}
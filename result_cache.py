@@ -0,0 +1,83 @@
+# result_cache.py
+
+import json
+import sqlite3
+import threading
+import time
+
+from keywords import normalize_keyword
+
+
+class ResultCache:
+    """
+    On-disk cache of detector results, keyed by normalized keyword, scope and day.
+
+    `scope` identifies where the search ran (geolocation + locale), so the same
+    keyword checked from another city or language is a separate entry.
+    Entries older than `ttl_hours` are ignored, and once the cache holds more
+    than `max_entries` rows the oldest ones are evicted.
+    """
+    EVICT_EVERY = 100  # puts between eviction passes
+
+    def __init__(self, path="ai_overview_cache.sqlite3", ttl_hours=24, max_entries=200_000):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " keyword TEXT NOT NULL, scope TEXT NOT NULL, day TEXT NOT NULL,"
+            " checked_at REAL NOT NULL, result TEXT NOT NULL,"
+            " PRIMARY KEY (keyword, scope, day))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_checked_at ON results (checked_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _day(timestamp):
+        return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+    def get(self, keyword, scope):
+        """Cached result for `keyword` in `scope`, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM results WHERE keyword = ? AND scope = ? AND day = ? AND checked_at >= ?",
+                (normalize_keyword(keyword), scope, self._day(now), now - self.ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, keyword, scope, result):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (keyword, scope, day, checked_at, result) VALUES (?, ?, ?, ?, ?)",
+                (normalize_keyword(keyword), scope, self._day(now), now, json.dumps(result)),
+            )
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def evict(self):
+        """Drop expired entries, then the oldest ones above `max_entries`."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM results WHERE checked_at < ?", (time.time() - self.ttl,))
+        if self.max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE rowid IN ("
+                " SELECT rowid FROM results ORDER BY checked_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.close()
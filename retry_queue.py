@@ -0,0 +1,134 @@
+# retry_queue.py
+
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class RetryPolicy:
+    """
+    How often and how late a captcha'd or errored keyword is searched again.
+
+    Attempt n (1-based) that failed is retried after roughly
+    `base_delay * 2 ** (n - 1)` seconds, capped at `max_delay` and jittered
+    down by up to half so retries from one batch do not land together.
+    After `max_attempts` searches the keyword is given up as "unknown".
+    """
+
+    def __init__(self, max_attempts=3, base_delay=30.0, max_delay=600.0):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, attempt):
+        return attempt < self.max_attempts
+
+    def delay(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class BatchScheduler:
+    """
+    Queue of keyword batches shared by the detector workers, where a batch
+    may only become ready later (a retry waiting out its backoff).
+
+    `get` blocks until a batch is ready and returns None once nothing is
+    queued and no batch is still being searched, since a batch in flight may
+    still put retries back; with a `timeout` it also returns None when that
+    runs out first. Every batch handed out by `get` must be
+    acknowledged with `done` after its retries have been `put`.
+
+    With a `refill` callable the queue is open-ended: whenever no batch is
+    ready, `get` lets one caller at a time run `refill`, which `put`s any new
+    batches and returns False once none will ever come. A refill that found
+    nothing is tried again `refill_interval` seconds later.
+
+    A producer outside the workers, such as a background HTTP tier, calls
+    `hold` before it starts `put`ting and `done` when it stops, so the queue
+    is not taken for drained in between.
+    """
+
+    def __init__(self, refill=None, refill_interval=30.0):
+        self._heap = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._refill = refill
+        self._refill_interval = refill_interval
+        self._refilling = False
+        self._next_refill = 0.0
+
+    def put(self, batch_no, batch, delay=0.0):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), batch_no, batch))
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        _, _, batch_no, batch = heapq.heappop(self._heap)
+                        self._in_flight += 1
+                        return batch_no, batch
+                    can_refill = self._refill is not None and not self._refilling
+                    if can_refill and now >= self._next_refill:
+                        self._refilling = True
+                        queued = len(self._heap)
+                        break
+                    if not self._heap and not self._in_flight and self._refill is None:
+                        return None
+                    waits = [self._heap[0][0] - now] if self._heap else []
+                    if can_refill:
+                        waits.append(self._next_refill - now)
+                    if deadline is not None:
+                        if now >= deadline:
+                            return None
+                        waits.append(deadline - now)
+                    self._cond.wait(min(waits) if waits else None)
+            self._run_refill(queued)
+
+    def _run_refill(self, queued):
+        """Ask `refill` for more batches outside the lock; a failing refill ends the queue like an exhausted one."""
+        more = False
+        try:
+            more = self._refill()
+        finally:
+            with self._cond:
+                self._refilling = False
+                if not more:
+                    self._refill = None
+                # Found nothing: leave the source alone for a while
+                found = len(self._heap) > queued
+                self._next_refill = 0.0 if found else time.monotonic() + self._refill_interval
+                self._cond.notify_all()
+
+    def hold(self):
+        """Count an outside producer as a batch in flight until its `done`."""
+        with self._cond:
+            self._in_flight += 1
+
+    def done(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def finished(self):
+        """Whether no batch is queued, in flight or still to come, i.e. `get` would return None for good."""
+        with self._cond:
+            return not self._heap and not self._in_flight and self._refill is None
+
+    def has_queued(self):
+        """Whether another batch (ready or waiting out its backoff) is still to come."""
+        with self._cond:
+            return bool(self._heap)
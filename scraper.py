@@ -1,7 +1,13 @@
 # scraper.py
 
+import asyncio
+import itertools
+import json
+import os
 import pickle
 import random
+import socket
+import threading
 import time
 
 from selenium import webdriver
@@ -9,19 +15,98 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 
-import csv
-import requests
 import typing
+from urllib.parse import urlencode
 import tempfile
 import shutil
-from openpyxl import Workbook  # type: ignore
+
+from keywords import SpreadsheetSource
+from metrics import METRICS, SUB_PHASES, Metrics
+from retry_queue import BatchScheduler, RetryPolicy
+from serp_parser import classify_html
+from session_pool import SessionPool, cdp_cookie
+from sinks import XlsxSink
 # --------------------------- Setup & Utilities ---------------------------
 
-def setup_chrome_driver():
-    """Setup Chrome driver with options and Jakarta geolocation."""
+GOOGLE_URL = "https://www.google.com"
+DEFAULT_LOCALE = {"hl": "id", "gl": "id"}
+
+NAVIGATION_TYPING = "typing"  # homepage, type into the search box, press RETURN
+NAVIGATION_DIRECT = "direct"  # load the results URL straight away
+NAVIGATION_MODES = (NAVIGATION_TYPING, NAVIGATION_DIRECT)
+
+# URL patterns blocked per tab through Network.setBlockedURLs. "lean" keeps the
+# HTML, CSS and Google's own scripts the AI overview needs to render, and drops
+# images, fonts, media, ads, analytics and logging pings.
+RESOURCE_POLICIES = {
+    "full": (),
+    "lean": (
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+        "*.woff", "*.woff2", "*.ttf", "*.otf",
+        "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+        "*encrypted-tbn*.gstatic.com*", "*fonts.gstatic.com*", "*fonts.googleapis.com*",
+        "*ytimg.com*", "*youtube.com*", "*googleusercontent.com*",
+        "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*",
+        "*google-analytics.com*", "*googletagmanager.com*",
+        "*/gen_204*", "*/client_204*", "*/log?*", "*play.google.com/log*",
+    ),
+}
+
+JAKARTA_GEOLOCATION = {"latitude": -6.2088, "longitude": 106.8456, "accuracy": 100}
+
+
+def cache_scope(locale, geolocation=JAKARTA_GEOLOCATION):
+    """ResultCache scope for searches run from `geolocation` with the hl/gl `locale`."""
+    return f"{geolocation['latitude']:.4f},{geolocation['longitude']:.4f}|hl={locale.get('hl')}|gl={locale.get('gl')}"
+
+
+def make_location(name, latitude, longitude, hl="id", gl="id", accuracy=100):
+    """A place to search from: the geolocation override of its tabs plus the hl/gl locale of its searches."""
+    return {
+        "name": name,
+        "geolocation": {"latitude": latitude, "longitude": longitude, "accuracy": accuracy},
+        "locale": {"hl": hl, "gl": gl},
+    }
+
+
+# Presets for ai_overview_detector(locations=[...]), which also takes make_location dicts
+LOCATIONS = {
+    "jakarta": make_location("jakarta", JAKARTA_GEOLOCATION["latitude"], JAKARTA_GEOLOCATION["longitude"]),
+    "surabaya": make_location("surabaya", -7.2575, 112.7521),
+    "bandung": make_location("bandung", -6.9175, 107.6191),
+    "medan": make_location("medan", 3.5952, 98.6722),
+    "denpasar": make_location("denpasar", -8.6705, 115.2126),
+}
+
+
+def prepare_tab(driver, resource_policy="lean", geolocation=JAKARTA_GEOLOCATION):
+    """Apply the per-tab CDP overrides (geolocation, blocked resources) to the current tab."""
+    driver.execute_cdp_cmd('Emulation.setGeolocationOverride', geolocation)
+
+    blocked = RESOURCE_POLICIES[resource_policy]
+    if blocked:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(blocked)})
+
+
+def free_port():
+    """A TCP port that is free right now, for Chrome's remote debugging endpoint."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def setup_chrome_driver(debugging_port=None, resource_policy="lean", page_load_strategy="eager"):
+    """Setup Chrome driver with options and Jakarta geolocation.
+
+    Every concurrent driver needs its own `debugging_port`; by default a free
+    one is picked, so any number of drivers can share a container. `resource_policy`
+    is a RESOURCE_POLICIES key; with the "eager" `page_load_strategy` driver.get
+    returns at DOMContentLoaded instead of waiting for every subresource.
+    """
     chrome_options = Options()
     chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--no-sandbox")
@@ -33,16 +118,13 @@ def setup_chrome_driver():
     chrome_options.add_argument(
         "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     )
-    chrome_options.add_argument("--remote-debugging-port=9222")
+    chrome_options.add_argument(f"--remote-debugging-port={debugging_port or free_port()}")
+    chrome_options.page_load_strategy = page_load_strategy
+    if resource_policy != "full":
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
 
     driver = webdriver.Chrome(options=chrome_options)
-
-    # Set Jakarta geolocation
-    driver.execute_cdp_cmd('Emulation.setGeolocationOverride', {
-        'latitude': -6.2088,
-        'longitude': 106.8456,
-        'accuracy': 100
-    })
+    prepare_tab(driver, resource_policy)
 
     return driver
 
@@ -63,19 +145,237 @@ def load_cookies_from_pickle(driver, filename="cookies.pkl"):
     except Exception as e:
         print(f"Could not load cookies: {e}")
 
+def read_pickled_cookies(filename="cookies.pkl"):
+    """Cookies of the legacy pickle file, or an empty list when it cannot be read."""
+    try:
+        with open(filename, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Could not load cookies: {e}")
+        return []
+
+def inject_cookies_from_pickle(driver, filename="cookies.pkl", url=GOOGLE_URL):
+    """Inject pickled cookies over CDP, without first navigating to the cookie's domain."""
+    cookies = read_pickled_cookies(filename)
+    if not cookies:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.setCookies", {
+            "cookies": [{"name": c["name"], "value": c["value"], "url": url} for c in cookies]
+        })
+        print("Cookies loaded successfully.")
+    except Exception as e:
+        print(f"Could not load cookies: {e}")
+
+def inject_session_cookies(driver, cookies, url=GOOGLE_URL):
+    """Inject a stored session's cookies over CDP with all their attributes (see session_pool.cdp_cookie)."""
+    try:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": [cdp_cookie(c, url) for c in cookies]})
+    except Exception as e:
+        print(f"Could not load cookies: {e}")
+
+# --------------------------- Driver Lifecycle ---------------------------
+
+# Browser backends of ai_overview_detector: blocking Selenium/chromedriver, or
+# asyncio DevTools-protocol pages multiplexed on one event loop (cdp_engine.py)
+ENGINE_SELENIUM = "selenium"
+ENGINE_CDP = "cdp"
+ENGINES = (ENGINE_SELENIUM, ENGINE_CDP)
+
+def _process_tree_rss_mb(pid):
+    """Resident memory of `pid` and all its descendants in MB (Linux /proc only, 0 elsewhere)."""
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+class DriverManager:
+    """
+    Keeps one Chrome warm across batches instead of a cold start per batch.
+
+    Between batches only the browser state is reset (tabs, cookies, storage)
+    and the batch's session cookies are injected, falling back to the legacy
+    `cookie_file` when no session is given. The browser is recycled after
+    `max_pages` searches or once its process tree grows past `max_rss_mb`.
+    """
+    RESET_ORIGINS = ("https://www.google.com", "https://google.com", "https://consent.google.com")
+
+    def __init__(self, debugging_port=None, max_pages=200, max_rss_mb=1200, cookie_file="cookies.pkl",
+                 resource_policy="lean", base_url=GOOGLE_URL, metrics=METRICS):
+        self.debugging_port = debugging_port
+        self.resource_policy = resource_policy
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.cookie_file = cookie_file
+        self.base_url = base_url
+        self.metrics = metrics
+        self.driver = None
+        self.pages = 0
+
+    def start_batch(self, load_homepage=True, session=None, geolocation=JAKARTA_GEOLOCATION, locale=None):
+        """Return a driver with clean state for the next batch, starting Chrome only when needed."""
+        self.ensure_driver()
+        self.reset(load_homepage, session, geolocation, locale)
+        return self.driver
+
+    def ensure_driver(self):
+        """Return the running driver, recycling or starting Chrome first when needed (no state reset)."""
+        if self.driver is not None and self._needs_recycle():
+            print(f"♻️ Recycling Chrome after {self.pages} pages")
+            self.metrics.inc("driver_recycles")
+            self.quit()
+        if self.driver is None:
+            with self.metrics.span("driver_startup"):
+                self.driver = setup_chrome_driver(debugging_port=self.debugging_port, resource_policy=self.resource_policy)
+            self.pages = 0
+        return self.driver
+
+    def reset(self, load_homepage=True, session=None, geolocation=JAKARTA_GEOLOCATION, locale=None):
+        """
+        Per-batch anti-detection reset: fresh tab, no cookies or site storage, saved cookies re-injected.
+        The homepage is opened in the hl/gl `locale`, which searches typed into it then carry.
+        """
+        driver = self.driver
+        old_handles = list(driver.window_handles)
+        driver.switch_to.new_window("tab")
+        fresh_handle = driver.current_window_handle
+        for handle in old_handles:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(fresh_handle)
+        # CDP overrides belong to a tab, so the fresh one needs them again
+        prepare_tab(driver, self.resource_policy, geolocation)
+
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in {self.base_url, *self.RESET_ORIGINS}:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        with self.metrics.span("cookie_load"):
+            if session is not None:
+                inject_session_cookies(driver, session.cookies, url=self.base_url)
+            else:
+                inject_cookies_from_pickle(driver, self.cookie_file, url=self.base_url)
+        if load_homepage:
+            driver.get(build_homepage_url(base_url=self.base_url, **(locale or {})))
+
+    def record_page(self):
+        self.pages += 1
+
+    def rss_mb(self):
+        process = getattr(self.driver.service, "process", None) if self.driver else None
+        return _process_tree_rss_mb(process.pid) if process else 0.0
+
+    def _needs_recycle(self):
+        if self.max_pages and self.pages >= self.max_pages:
+            return True
+        return bool(self.max_rss_mb) and self.rss_mb() > self.max_rss_mb
+
+    def quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"Error closing Chrome: {e}")
+            self.driver = None
+            self.pages = 0
+
 # --------------------------- Bot Detection ---------------------------
 
+PAGE_STATE_CAPTCHA = "captcha"
+PAGE_STATE_OVERVIEW = "overview"
+PAGE_STATE_RESULTS = "results"  # results page without an AI overview
+PAGE_STATE_TIMEOUT = "timeout"
+
+
 class BotDetector:
     """
-    Handles bot detection during scraping.
+    Classifies a Google results page as captcha, AI overview or plain results.
+
+    Every selector lives here, so a Google markup change is fixed in one place.
+    Selectors are CSS unless prefixed with "xpath:".
     """
     BOT_DETECTION_XPATH = "/html/body/div[1]/div/br[2]"  # Example: replace with actual element Google shows on captcha page
 
+    CAPTCHA_SELECTORS = ("xpath:" + BOT_DETECTION_XPATH, "#captcha-form", "form[action*='/sorry/']")
+    OVERVIEW_SELECTORS = ("#m-x-content",)
+    RESULTS_SELECTORS = ("#search", "#rso")
+
+    # Runs in the page and answers in a single WebDriver round trip
+    CLASSIFY_SCRIPT = """
+        const started = performance.now();
+        const groups = arguments[0];
+        const find = (selector) => selector.startsWith("xpath:")
+            ? document.evaluate(selector.slice(6), document, null,
+                XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+            : document.querySelector(selector);
+        for (const [verdict, selectors] of groups) {
+            for (const selector of selectors) {
+                const element = find(selector);
+                if (element) {
+                    return {
+                        verdict: verdict,
+                        selector: selector,
+                        text: verdict === "overview" ? element.innerText : null,
+                        elapsed_ms: performance.now() - started,
+                    };
+                }
+            }
+        }
+        return {verdict: null, selector: null, text: null, elapsed_ms: performance.now() - started};
+    """
+
+    @classmethod
+    def selector_groups(cls):
+        """Selector groups in match order; the first group with a hit decides the verdict."""
+        return [
+            [PAGE_STATE_CAPTCHA, list(cls.CAPTCHA_SELECTORS)],
+            [PAGE_STATE_OVERVIEW, list(cls.OVERVIEW_SELECTORS)],
+            [PAGE_STATE_RESULTS, list(cls.RESULTS_SELECTORS)],
+        ]
+
+    @classmethod
+    def classify(cls, driver):
+        """
+        Classify the current page with one injected script.
+
+        Args:
+            driver: Selenium WebDriver instance
+
+        Returns:
+            dict: verdict (PAGE_STATE_* or None while the page is still loading),
+            text of the overview, matching selector, in-page elapsed_ms and
+            round_trip_ms as seen from Python
+        """
+        started = time.perf_counter()
+        verdict = driver.execute_script(cls.CLASSIFY_SCRIPT, cls.selector_groups())
+        verdict["round_trip_ms"] = (time.perf_counter() - started) * 1000
+        return verdict
+
+    @classmethod
+    def classify_html(cls, html):
+        """Browser-free classify() of a page source, with the same selectors (see serp_parser)."""
+        return classify_html(html, cls.selector_groups())
+
     @staticmethod
     def check_bot_detection(driver, timeout=5):
         """
         Check if bot detection is triggered.
 
+        Returns as soon as the page shows a captcha or regular results,
+        instead of waiting out the full timeout on every clean page.
+
         Args:
             driver: Selenium WebDriver instance
             timeout: seconds to wait
@@ -84,18 +384,107 @@ class BotDetector:
             bool: True if detected, False otherwise
         """
         try:
-            time.sleep(random.uniform(1, 2))
-            WebDriverWait(driver, timeout).until(
-                EC.presence_of_element_located((By.XPATH, BotDetector.BOT_DETECTION_XPATH))
-            )
-            print("⚠️ Bot detection triggered!")
-            return True
-        except TimeoutException:
+            if wait_for_page_state(driver, timeout)["verdict"] == PAGE_STATE_CAPTCHA:
+                print("⚠️ Bot detection triggered!")
+                return True
             return False
         except Exception as e:
             print(f"Error checking bot detection: {str(e)}")
             return True
 
+# --------------------------- Page State & Pacing ---------------------------
+
+PAGE_STATE_WAIT = 10  # seconds a results page gets to reach a known state
+OVERVIEW_GRACE = 1.5  # seconds "results" must hold before it counts as "no overview"
+
+
+class PageStateTracker:
+    """
+    Final state of one results page, from the classify verdicts of successive polls.
+
+    The first known state is final, except "results": the AI overview streams
+    in after the organic results, so "results" only counts once it has held
+    for `overview_grace` seconds. Once `timeout` seconds have passed since
+    the tracker was created, the first "results" verdict is final, or a
+    PAGE_STATE_TIMEOUT one if the page never reached a known state. Every
+    engine polls in its own way and feeds the verdicts in here.
+    """
+
+    def __init__(self, timeout=PAGE_STATE_WAIT, overview_grace=OVERVIEW_GRACE):
+        self.timeout = timeout
+        self.overview_grace = overview_grace
+        self.started = time.monotonic()
+        self.first_results = None  # (seen at, verdict)
+
+    def feed(self, verdict):
+        """The final verdict after this poll's `verdict` (None: page unreadable), or None to keep polling."""
+        now = time.monotonic()
+        state = verdict["verdict"] if verdict is not None else None
+        if state == PAGE_STATE_RESULTS:
+            if self.first_results is None:
+                self.first_results = (now, verdict)
+            if now - self.first_results[0] >= self.overview_grace:
+                return verdict
+        elif state:
+            return verdict
+        if now - self.started < self.timeout:
+            return None
+        if self.first_results is not None:
+            return self.first_results[1]
+        return {"verdict": PAGE_STATE_TIMEOUT, "selector": None, "text": None, "elapsed_ms": None, "round_trip_ms": None}
+
+
+def wait_for_page_state(driver, timeout=PAGE_STATE_WAIT, overview_grace=OVERVIEW_GRACE, poll_frequency=0.1):
+    """
+    Wait until the results page reaches a known state and return it as soon as it does.
+
+    Args:
+        driver: Selenium WebDriver instance
+        timeout: seconds to wait for any known state
+        overview_grace: the AI overview streams in after the organic results,
+            so "results" is only reported once it has been stable this long
+        poll_frequency: seconds between classifier runs
+
+    Returns:
+        dict: the BotDetector.classify verdict; its "verdict" is
+        PAGE_STATE_TIMEOUT if the page never reached a known state
+    """
+    tracker = PageStateTracker(timeout, overview_grace)
+    while True:
+        page = tracker.feed(BotDetector.classify(driver))
+        if page is not None:
+            return page
+        time.sleep(poll_frequency)
+
+
+class PacingPolicy:
+    """
+    Human-like jitter layered on top of the page-state waits.
+
+    Each phase is a (min, max) range in seconds; (0, 0) turns it off.
+    Detection never sleeps on its own, all deliberate delays live here.
+    """
+
+    def __init__(self, batch_start=(1, 2), before_search=(0.5, 1.5), between_batches=(10, 20)):
+        self.batch_start = batch_start
+        self.before_search = before_search
+        self.between_batches = between_batches
+
+    def delay(self, phase):
+        """A random delay of the given phase, for callers that schedule it instead of sleeping."""
+        low, high = getattr(self, phase)
+        return random.uniform(low, high) if high > 0 else 0.0
+
+    def pause(self, phase):
+        """Sleep for a random delay of the given phase and return it."""
+        delay = self.delay(phase)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+NO_PACING = PacingPolicy(batch_start=(0, 0), before_search=(0, 0), between_batches=(0, 0))
+
 # --------------------------- Google Login ---------------------------
 
 def google_login(email, password):
@@ -307,144 +696,892 @@ def google_login(email, password):
 
 #     return results
 
-def ai_overview_detector(all_keywords):
+class RequestRateLimiter:
     """
-    Detect AI Overview for list of keywords, split into random batches.
-    Save every 100 results immediately.
+    Global cap on Google searches per minute, shared by every worker thread.
+    Slots are handed out evenly spaced, so N workers never burst past the cap.
+    """
+
+    def __init__(self, max_per_minute=None):
+        self.interval = 60.0 / max_per_minute if max_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def reserve(self):
+        """Claim the next slot without blocking; returns the seconds to wait before searching."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot - now
+
+    def acquire(self):
+        """Block until the caller may issue its next search."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def split_keywords_random_batches(keywords, min_size=3, max_size=8):
+    batches = []
+    cursor = 0
+    while cursor < len(keywords):
+        batch_size = random.randint(min_size, max_size)
+        batch = keywords[cursor:cursor + batch_size]
+        batches.append(batch)
+        cursor += batch_size
+    return batches
+
+
+def build_search_url(keyword, hl=None, gl=None, base_url=GOOGLE_URL, **params):
     """
-    def split_keywords_random_batches(keywords, min_size=3, max_size=8):
-        batches = []
-        cursor = 0
-        while cursor < len(keywords):
-            batch_size = random.randint(min_size, max_size)
-            batch = keywords[cursor:cursor + batch_size]
-            batches.append(batch)
-            cursor += batch_size
-        return batches
+    Results URL for `keyword`, e.g. build_search_url("kopi", hl="id", gl="id").
+    Extra Google parameters such as `lr` or `num` pass through as keywords.
+    """
+    query = {"q": keyword, "hl": hl, "gl": gl, **params}
+    return f"{base_url}/search?" + urlencode({k: v for k, v in query.items() if v is not None})
+
+
+def build_homepage_url(hl=None, gl=None, base_url=GOOGLE_URL):
+    """Homepage URL in the hl/gl locale, the starting point of typed searches."""
+    query = urlencode({k: v for k, v in {"hl": hl, "gl": gl}.items() if v is not None})
+    return f"{base_url}/?{query}" if query else base_url
 
-    batches = split_keywords_random_batches(all_keywords)
-    print(f"🔍 Total keywords: {len(all_keywords)}, running in {len(batches)} batches...")
 
-    results = []
+# Final answer of a keyword: "unknown" when every attempt hit a captcha or an error
+STATUS_OVERVIEW = "overview"
+STATUS_NO_OVERVIEW = "no_overview"
+STATUS_UNKNOWN = "unknown"
 
-    for idx, batch in enumerate(batches):
-        print(f"\n🚀 Batch {idx+1}: {len(batch)} keywords")
 
-        driver = setup_chrome_driver()
-        wait = WebDriverWait(driver, 10)
-        batch_results = []
+def _search_keyword(driver, wait, keyword, run, location):
+    """
+    Search one keyword on an already prepared driver and return its result record.
+    The record's "timings" holds the navigate / wait_for_state / classify milliseconds.
+    """
+    try:
+        run.pacing.pause("before_search")
+        started = time.perf_counter()
+        if run.navigation == NAVIGATION_DIRECT:
+            driver.get(build_search_url(keyword, base_url=run.base_url, **location["locale"]))
+        else:
+            search_box = wait.until(EC.element_to_be_clickable((By.NAME, "q")))
+            search_box.clear()
+            search_box.send_keys(keyword)
+            search_box.send_keys(Keys.RETURN)
+        navigated = time.perf_counter()
+
+        page = wait_for_page_state(driver)
+        if run.archive is not None:
+            _capture(run, driver.page_source, keyword, location, page)
+        result = _page_result(keyword, run, page, _search_timings(run, started, navigated, page))
+
+        if run.navigation == NAVIGATION_TYPING and not result["bot_detected"]:
+            driver.get(build_homepage_url(base_url=run.base_url, **location["locale"]))
+        return result
+
+    except Exception as e:
+        print(f"⚠️ Error on '{keyword}': {e}")
+        return _error_result(keyword, run, e)
+
 
+def _capture(run, html, keyword, location, page):
+    """Archive the page a verdict was reached on, for offline replay (see serp_archive.py)."""
+    try:
+        with run.metrics.span("capture"):
+            run.archive.put(
+                html,
+                keyword=keyword,
+                location=location["name"],
+                navigation=run.navigation,
+                # A timed-out page matched no selector, which is what replay reports as None
+                verdict=None if page["verdict"] == PAGE_STATE_TIMEOUT else page["verdict"],
+                selector=page["selector"],
+            )
+    except Exception as e:
+        print(f"⚠️ Could not archive the page of '{keyword}': {e}")
+
+
+def _search_timings(run, started, navigated, page):
+    """Navigate / wait_for_state / classify milliseconds of one search, also fed to the run metrics."""
+    timings = {
+        "navigate": (navigated - started) * 1000,
+        "wait_for_state": (time.perf_counter() - navigated) * 1000,
+        "classify": page["round_trip_ms"],
+    }
+    run.metrics.observe("navigation", timings["navigate"] / 1000)
+    run.metrics.observe("wait_for_state", timings["wait_for_state"] / 1000)
+    if page["round_trip_ms"] is not None:
+        run.metrics.observe("classification", page["round_trip_ms"] / 1000)
+    return timings
+
+
+def _page_result(keyword, run, page, timings):
+    """Result record of a results page that reached `page` (a wait_for_page_state verdict)."""
+    if page["verdict"] == PAGE_STATE_CAPTCHA:
+        print(f"⚠️ Bot detected for '{keyword}'")
+        return {
+            "keyword": keyword,
+            "detected": False,
+            "text": None,
+            "bot_detected": True,
+            "status": STATUS_UNKNOWN,
+            "navigation": run.navigation,
+            "timings": timings
+        }
+
+    if page["verdict"] == PAGE_STATE_OVERVIEW:
+        detected_text = page["text"]
+        print(f"✅ AI Overview for '{keyword}': {detected_text[:100]}...")
+        return {
+            "keyword": keyword,
+            "detected": True,
+            "text": detected_text,
+            "bot_detected": False,
+            "status": STATUS_OVERVIEW,
+            "navigation": run.navigation,
+            "timings": timings
+        }
+
+    if page["verdict"] == PAGE_STATE_TIMEOUT:
+        print(f"⚠️ Results page for '{keyword}' never reached a known state")
+        result = _error_result(keyword, run, "results page never reached a known state")
+        result["timings"] = timings
+        return result
+
+    print(f"❌ No AI Overview for '{keyword}'")
+    return {
+        "keyword": keyword,
+        "detected": False,
+        "text": None,
+        "bot_detected": False,
+        "status": STATUS_NO_OVERVIEW,
+        "navigation": run.navigation,
+        "timings": timings
+    }
+
+
+def _error_result(keyword, run, error):
+    return {
+        "keyword": keyword,
+        "detected": False,
+        "text": None,
+        "bot_detected": False,
+        "status": STATUS_UNKNOWN,
+        "navigation": run.navigation,
+        "error": str(error)
+    }
+
+
+def _is_settled(result):
+    """Whether a result is a real answer, as opposed to a captcha or an error worth searching again."""
+    return not result["bot_detected"] and not result.get("error")
+
+
+class _DetectorRun:
+    """Settings and shared state of one ai_overview_detector run, handed to every worker."""
+
+    def __init__(self, rate_limiter, rate_controllers, sessions, pacing, retry, navigation, locations,
+                 resource_policy, cache, journal, sinks, archive, base_url, metrics):
+        # One slot per (keyword, location): index = keyword position * len(locations) + location position
+        self.results = []
+        self.rate_limiter = rate_limiter
+        self.rate_controllers = rate_controllers
+        self.sessions = sessions
+        self.pacing = pacing
+        self.retry = retry
+        self.navigation = navigation
+        self.locations = locations
+        self.resource_policy = resource_policy
+        self.cache = cache
+        self.cache_scopes = [cache_scope(location["locale"], location["geolocation"]) for location in locations]
+        self.journal = journal
+        self.sinks = sinks
+        self.archive = archive
+        self.base_url = base_url
+        self.metrics = metrics
+
+    def location_of(self, index):
+        return self.locations[index % len(self.locations)]
+
+    def cache_scope_of(self, index):
+        return self.cache_scopes[index % len(self.locations)]
+
+    def emit(self, result):
+        """Stream one settled result into every sink."""
+        for sink in self.sinks:
+            sink.write(result)
+
+    def count(self, result):
+        """Outcome counters of one search attempt."""
+        if result.get("error"):
+            self.metrics.inc("errors")
+        elif result["bot_detected"]:
+            self.metrics.inc("captchas")
+        elif result["detected"]:
+            self.metrics.inc("overview_hits")
+        else:
+            self.metrics.inc("no_overview")
+
+    def persist(self, index, result):
+        """Journal, cache and stream the final result of a searched keyword."""
+        self.results[index] = result
+        self.metrics.inc("keywords")
+        if result["status"] == STATUS_UNKNOWN:
+            self.metrics.inc("unknown")
+        with self.metrics.span("persistence"):
+            if _is_settled(result):
+                if self.journal is not None:
+                    self.journal.record(index, result)
+                if self.cache is not None:
+                    self.cache.put(result["keyword"], self.cache_scope_of(index), result)
+            self.emit(result)
+
+
+def _settle_attempt(run, index, keyword, attempt, result, retries):
+    """Persist a final result, or hold a failed attempt back for a later batch while attempts remain."""
+    result["attempts"] = attempt
+    result["location"] = run.location_of(index)["name"]
+    run.count(result)
+    if not _is_settled(result) and run.retry.should_retry(attempt):
+        run.metrics.inc("retries")
+        retries.append((index, keyword, attempt + 1))
+        return
+    if not _is_settled(result):
+        print(f"❔ Giving up on '{keyword}' after {attempt} attempt(s)")
+    run.persist(index, result)
+
+
+def _abort_batch(run, items, error, retries):
+    """
+    Settle the unsearched rest of an aborted batch as errors. A sink, journal
+    or cache failing here is only reported: the worker must still acknowledge
+    the batch, or every other worker waits on it forever.
+    """
+    for index, keyword, attempt in items:
         try:
-            driver.get("https://www.google.com")
-            driver.delete_all_cookies()
-            load_cookies_from_pickle(driver)
-            driver.get("https://www.google.com")
-            time.sleep(2 + random.random())
+            _settle_attempt(run, index, keyword, attempt, _error_result(keyword, run, error), retries)
+        except Exception as e:
+            print(f"⚠️ Could not record the failure of '{keyword}': {e}")
 
-            for keyword in batch:
-                try:
-                    search_box = wait.until(EC.element_to_be_clickable((By.NAME, "q")))
-                    search_box.clear()
-                    search_box.send_keys(keyword)
-                    search_box.send_keys(Keys.RETURN)
-                    time.sleep(2 + random.random())
-
-                    if BotDetector.check_bot_detection(driver):
-                        print(f"⚠️ Bot detected for '{keyword}'")
-                        batch_results.append({
-                            "keyword": keyword,
-                            "detected": False,
-                            "text": None,
-                            "bot_detected": True
-                        })
-                        continue
-
-                    try:
-                        element = driver.find_element(By.ID, "m-x-content")
-                        detected_text = element.text
-                        print(f"✅ AI Overview for '{keyword}': {detected_text[:100]}...")
-                        batch_results.append({
-                            "keyword": keyword,
-                            "detected": True,
-                            "text": detected_text,
-                            "bot_detected": False
-                        })
-                    except Exception:
-                        print(f"❌ No AI Overview for '{keyword}'")
-                        batch_results.append({
-                            "keyword": keyword,
-                            "detected": False,
-                            "text": None,
-                            "bot_detected": False
-                        })
-
-                    driver.get("https://www.google.com")
-                    time.sleep(1 + random.random())
 
-                except Exception as e:
-                    print(f"⚠️ Error on '{keyword}': {e}")
-                    batch_results.append({
-                        "keyword": keyword,
-                        "detected": False,
-                        "text": None,
-                        "bot_detected": False
-                    })
+def _record_feedback(run, controller, session, result):
+    """Feed a search outcome to the identity's rate controller and session stats; errors say nothing about either."""
+    if result.get("error"):
+        return
+    if controller is not None:
+        controller.record(captcha=result["bot_detected"])
+    if session is not None:
+        timings = result["timings"]
+        latency_s = (timings["navigate"] + timings["wait_for_state"]) / 1000
+        run.sessions.record(session, result["bot_detected"], latency_s)
 
+
+class _Batch:
+    """
+    One batch a worker took from the scheduler, and the identity it runs as.
+
+    Taking it acquires a stored session (or stands for the legacy
+    `cookie_file`) and that identity's rate controller; `settle` feeds each
+    searched keyword back in order, `abort` fails the rest, and `finish`
+    hands the batch back, which every worker must reach whatever happened.
+    """
+
+    def __init__(self, run, scheduler, item, cookie_file="cookies.pkl"):
+        self.run = run
+        self.scheduler = scheduler
+        self.number, self.items = item
+        self.attempt = self.items[0][2]
+        # Batches never mix locations, so the override is set once per fresh tab
+        self.location = run.location_of(self.items[0][0])
+        self.position = 0
+        self.retries = []
+        try:
+            self.session = run.sessions.acquire() if run.sessions is not None else None
+            # Without stored sessions the legacy cookie file is the one identity
+            self.identity = self.session.name if self.session is not None else cookie_file
+            self.controller = run.rate_controllers.get(self.identity) if run.rate_controllers else None
+        except BaseException:
+            # No worker holds the batch yet, so no finish() would acknowledge it
+            scheduler.done()
+            raise
+
+    @property
+    def label(self):
+        return f"Batch {self.number}" + (f" (attempt {self.attempt})" if self.attempt > 1 else "")
+
+    @property
+    def searched(self):
+        return self.position == len(self.items)
+
+    def next(self):
+        """(index, keyword, attempt) of the next keyword to search."""
+        return self.items[self.position]
+
+    def settle(self, result):
+        """Feed back and persist the outcome of the next keyword."""
+        index, keyword, attempt = self.items[self.position]
+        # Counted first: a failing sink must not get the keyword settled twice by abort()
+        self.position += 1
+        _record_feedback(self.run, self.controller, self.session, result)
+        _settle_attempt(self.run, index, keyword, attempt, result, self.retries)
+
+    def abort(self, error):
+        """Settle every keyword not searched yet as an error."""
+        _abort_batch(self.run, self.items[self.position:], error, self.retries)
+        self.position = len(self.items)
+
+    def finish(self, worker):
+        """Release the session, queue the retries after their backoff and acknowledge the batch."""
+        try:
+            if self.run.sessions is not None:
+                self.run.sessions.release(self.session)
+            if self.retries:
+                delay = self.run.retry.delay(self.attempt)
+                print(f"🔁 [{worker}] Retrying {len(self.retries)} keyword(s) of batch {self.number} in {delay:.0f}s")
+                self.scheduler.put(self.number, self.retries, delay=delay)
         finally:
-            driver.quit()
+            self.scheduler.done()
 
-        # Merge current batch into results
-        results.extend(batch_results)
 
-        # ✅ Save every 100 results collected so far
-        if len(results) % 100 == 0 or idx == len(batches) - 1:
-            part = len(results) // 100
-            filename = f"ai_overview_results_part{part + 1}.xlsx"
-            save_results_to_excel(results[-100:], filename)
-            print(f"✅ Saved last 100 results to {filename}")
+def _detector_worker(worker_id, scheduler, run, tabs=1):
+    """
+    Pull batches from the shared scheduler until no work is left, reusing one warm browser.
+    Captcha'd and errored keywords go back to the scheduler as a delayed retry batch.
+    With several `tabs` the batches run concurrently in one browser (see _TabWorker).
+    """
+    if tabs > 1:
+        return _TabWorker(worker_id, scheduler, run, tabs).work()
+    manager = DriverManager(resource_policy=run.resource_policy,
+                            base_url=run.base_url, metrics=run.metrics)
+    try:
+        while True:
+            item = scheduler.get()
+            if item is None:
+                return
+            batch = _Batch(run, scheduler, item, cookie_file=manager.cookie_file)
+            location = batch.location
+            flagged = False
+
+            print(f"\n🚀 [worker {worker_id}] {batch.label}: {len(batch.items)} keywords in {location['name']} "
+                  f"as {batch.identity}")
+            try:
+                driver = manager.start_batch(load_homepage=run.navigation == NAVIGATION_TYPING, session=batch.session,
+                                             geolocation=location["geolocation"], locale=location["locale"])
+                wait = WebDriverWait(driver, 10)
+                run.pacing.pause("batch_start")
+
+                while not batch.searched:
+                    if batch.controller is not None:
+                        batch.controller.acquire()
+                    run.rate_limiter.acquire()
+                    result = _search_keyword(driver, wait, batch.next()[1], run, location)
+                    manager.record_page()
+                    batch.settle(result)
+                    flagged = flagged or result["bot_detected"]
+                if flagged:
+                    # A flagged browser would likely be flagged again; the retries get a fresh one
+                    manager.quit()
+            except Exception as e:
+                print(f"⚠️ [worker {worker_id}] {batch.label} aborted: {e}")
+                # Never carry a browser in unknown state into the next batch
+                manager.quit()
+                batch.abort(e)
+            finally:
+                batch.finish(f"worker {worker_id}")
+
+            if scheduler.has_queued():
+                print(f"✅ [worker {worker_id}] Finished batch {batch.number}, pausing before next batch...")
+                wait_time = run.pacing.pause("between_batches")
+                print(f"⏱️ [worker {worker_id}] Paused {wait_time:.1f}s")
+    finally:
+        manager.quit()
+
+
+class _TabSlot:
+    """One tab of a _TabWorker: its browser context, its current batch and the search in flight."""
+
+    def __init__(self):
+        self.handle = None
+        self.context_id = None
+        self.batch = None
+        self.ready_at = 0.0
+        self.claimed = 0
+        self.search = None
+
+    @property
+    def active(self):
+        return self.batch is not None
+
+
+class _TabWorker:
+    """
+    Several concurrent keyword streams in one Chrome, one tab per stream.
+
+    Each tab lives in its own browser context, so cookies, storage and cache
+    are as isolated as in separate browsers, and each batch gets a brand-new
+    context. Searches are started with a non-blocking location change and the
+    tabs are polled round-robin, so their page loads overlap while one thread
+    drives the browser. Pacing delays and rate-limit slots are scheduled per tab
+    rather than slept, so a tab waiting for its turn never holds up the others.
+    """
 
-        if idx < len(batches) - 1:
-            wait_time = random.uniform(10, 20)
-            print(f"✅ Finished batch {idx+1}, waiting {wait_time:.1f}s before next batch...")
-            time.sleep(wait_time)
+    NAVIGATE_SCRIPT = "document.documentElement.replaceChildren(); window.location.href = arguments[0];"
 
-    return results
+    def __init__(self, worker_id, scheduler, run, tabs, poll_frequency=0.1):
+        self.worker_id = worker_id
+        self.scheduler = scheduler
+        self.run = run
+        self.poll_frequency = poll_frequency
+        self.slots = [_TabSlot() for _ in range(tabs)]
+        self.manager = DriverManager(resource_policy=run.resource_policy, base_url=run.base_url, metrics=run.metrics)
+        self.control_handle = None
+
+    def work(self):
+        try:
+            while True:
+                active = [slot for slot in self.slots if slot.active]
+                if not active:
+                    time.sleep(max(0.0, self.slots[0].ready_at - time.monotonic()))
+                    item = self.scheduler.get()
+                    if item is None:
+                        return
+                    self._guarded(self._start, self.slots[0], item)
+                    continue
+
+                # A browser due for recycling takes no new batches until its tabs drain
+                if not self.manager._needs_recycle():
+                    now = time.monotonic()
+                    for slot in self.slots:
+                        if not slot.active and slot.ready_at <= now:
+                            item = self.scheduler.get(timeout=0)
+                            if item is None:
+                                break
+                            self._guarded(self._start, slot, item)
+
+                progressed = False
+                for slot in self.slots:
+                    if slot.active:
+                        progressed = self._guarded(self._step, slot) or progressed
+                if not progressed:
+                    time.sleep(self.poll_frequency)
+        finally:
+            # Whatever took this thread down, batches still in its tabs must be acknowledged
+            for slot in self.slots:
+                if slot.active:
+                    self._end(slot, dispose=False)
+            self.manager.quit()
+
+    def _guarded(self, action, *args):
+        """Run a tab action; on failure every tab's batch is aborted, as the browser is in unknown state."""
+        try:
+            return action(*args)
+        except Exception as e:
+            print(f"⚠️ [worker {self.worker_id}] Tabs aborted: {e}")
+            for slot in self.slots:
+                if slot.active:
+                    slot.batch.abort(e)
+                    slot.search = None
+                    self._end(slot, dispose=False)
+            self.manager.quit()
+            return True
+
+    def _driver(self):
+        """The browser for a new batch; only called with no tab busy when a recycle is due."""
+        driver = self.manager.driver
+        if driver is None or self.manager._needs_recycle():
+            driver = self.manager.ensure_driver()
+            # Target commands go through a tab that outlives every batch context
+            self.control_handle = driver.current_window_handle
+        return driver
+
+    def _start(self, slot, item):
+        run = self.run
+        slot.batch = batch = _Batch(run, self.scheduler, item, cookie_file=self.manager.cookie_file)
+        location = batch.location
+        print(f"\n🚀 [worker {self.worker_id}] Batch {batch.number}: {len(batch.items)} keywords in {location['name']} "
+              f"as {batch.identity} in a new tab")
+
+        driver = self._driver()
+        driver.switch_to.window(self.control_handle)
+        slot.context_id = driver.execute_cdp_cmd("Target.createBrowserContext", {})["browserContextId"]
+        slot.handle = driver.execute_cdp_cmd("Target.createTarget", {
+            "url": "about:blank", "browserContextId": slot.context_id,
+        })["targetId"]
+        driver.switch_to.window(slot.handle)
+        prepare_tab(driver, run.resource_policy, location["geolocation"])
+        with run.metrics.span("cookie_load"):
+            if batch.session is not None:
+                inject_session_cookies(driver, batch.session.cookies, url=run.base_url)
+            else:
+                inject_cookies_from_pickle(driver, self.manager.cookie_file, url=run.base_url)
+        slot.ready_at = time.monotonic() + run.pacing.delay("batch_start")
+        slot.claimed = 0
+        return True
+
+    def _step(self, slot):
+        """Advance one tab: start its next search once due, or poll the one in flight. True if anything happened."""
+        run = self.run
+        driver = self.manager.driver
+        batch = slot.batch
+        _, keyword, _ = batch.next()
+        if slot.search is None:
+            if slot.ready_at > time.monotonic():
+                return False
+            # Claim the identity's slot, then the global one, waiting each out through ready_at
+            limiters = [limiter for limiter in (batch.controller, run.rate_limiter) if limiter is not None]
+            while slot.claimed < len(limiters):
+                delay = limiters[slot.claimed].reserve()
+                slot.claimed += 1
+                if delay > 0:
+                    slot.ready_at = time.monotonic() + delay
+                    return False
+            slot.claimed = 0
+            driver.switch_to.window(slot.handle)
+            started = time.perf_counter()
+            url = build_search_url(keyword, base_url=run.base_url, **batch.location["locale"])
+            driver.execute_script(self.NAVIGATE_SCRIPT, url)
+            slot.search = {"started": started, "navigated": time.perf_counter(), "state": PageStateTracker()}
+            return True
+
+        driver.switch_to.window(slot.handle)
+        try:
+            verdict = BotDetector.classify(driver)
+        except WebDriverException:
+            verdict = None  # the old document is being torn down
+        page = slot.search["state"].feed(verdict)
+        if page is None:
+            return False
+
+        timings = _search_timings(run, slot.search["started"], slot.search["navigated"], page)
+        slot.search = None
+        if run.archive is not None:
+            _capture(run, driver.page_source, keyword, batch.location, page)
+        result = _page_result(keyword, run, page, timings)
+        self.manager.record_page()
+        batch.settle(result)
+        if batch.searched:
+            self._end(slot)
+        else:
+            slot.ready_at = time.monotonic() + run.pacing.delay("before_search")
+        return True
+
+    def _end(self, slot, dispose=True):
+        """Hand back a finished batch: queue its retries and drop its browser context, cookies and all."""
+        batch, context_id = slot.batch, slot.context_id
+        slot.batch = slot.handle = slot.context_id = None
+        try:
+            batch.finish(f"worker {self.worker_id}")
+        finally:
+            slot.ready_at = time.monotonic() + (
+                self.run.pacing.delay("between_batches") if self.scheduler.has_queued() else 0.0
+            )
+            if dispose and context_id is not None:
+                try:
+                    driver = self.manager.driver
+                    driver.switch_to.window(self.control_handle)
+                    driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+                except Exception as e:
+                    print(f"Error closing tab context: {e}")
+        print(f"✅ [worker {self.worker_id}] Finished batch {batch.number}")
+
+
+def _resolve_locations(locations, locale=None):
+    """make_location dicts for `locations` (LOCATIONS names or dicts); by default Jakarta with `locale`."""
+    if not locations:
+        return [dict(LOCATIONS["jakarta"], locale=locale or DEFAULT_LOCALE)]
+    resolved = []
+    for location in locations:
+        if isinstance(location, str):
+            if location not in LOCATIONS:
+                raise ValueError(f"Unknown location {location!r}, expected one of {tuple(LOCATIONS)}")
+            location = LOCATIONS[location]
+        resolved.append(location)
+    if len({location["name"] for location in resolved}) != len(resolved):
+        raise ValueError("Location names must be unique")
+    return resolved
+
+
+def _plan_batches(run, keywords, scheduler, batch_numbers, cache=None, force_refresh=False, http_tier=None,
+                  journaled=None):
+    """
+    Give `keywords` the next result slots of the run and put batches of those
+    still to search on `scheduler`, numbered from `batch_numbers`.
+
+    Slots already settled by a resumed journal (`journaled`, index -> result)
+    or answered from `cache` are streamed right away. With an `http_tier` the
+    rest is fetched without a browser first, on a thread of its own that puts
+    the escalated batches as they fill up, so the browsers start on those
+    meanwhile. Batches never mix locations. Returns how many keywords are left.
+    """
+    per_keyword = len(run.locations)
+    start = len(run.results)
+    run.results.extend([None] * (len(keywords) * per_keyword))
+    journaled = journaled or {}
+    pending = [[] for _ in run.locations]
+    cache_hits = 0
+    for index in range(start, len(run.results)):
+        keyword = keywords[(index - start) // per_keyword]
+        if index in journaled:
+            # Marked, so that consumers counting searches leave it out the second time
+            run.results[index] = dict(journaled[index], resumed=True)
+            run.emit(run.results[index])
+            continue
+        hit = cache.get(keyword, run.cache_scope_of(index)) if cache is not None and not force_refresh else None
+        if hit is None:
+            pending[index % per_keyword].append((index, keyword, 1))
+        else:
+            run.results[index] = dict(hit, keyword=keyword, location=run.location_of(index)["name"], cached=True)
+            cache_hits += 1
+            run.metrics.inc("cache_hits")
+            run.emit(run.results[index])
+            if run.journal is not None:
+                run.journal.record(index, run.results[index])
+    if cache_hits:
+        print(f"💾 {cache_hits} keywords answered from cache")
+    if http_tier is not None and any(pending):
+        # In index order, so the locations' keywords are fetched interleaved
+        units = sorted(unit for location_units in pending for unit in location_units)
+        scheduler.hold()
+        threading.Thread(target=_run_http_tier, args=(run, http_tier, units, scheduler, batch_numbers),
+                         name="http-tier", daemon=True).start()
+        return len(units)
+
+    batches = [batch for location_units in pending for batch in split_keywords_random_batches(location_units)]
+    if per_keyword > 1:
+        random.shuffle(batches)
+    for batch in batches:
+        scheduler.put(next(batch_numbers), batch)
+    return sum(len(batch) for batch in batches)
+
+
+def _run_http_tier(run, http_tier, units, scheduler, batch_numbers):
+    """Thread body: settle `units` over HTTP, scheduling the escalated ones, then release the scheduler."""
+    try:
+        escalated = http_tier.settle(run, units, lambda batch: scheduler.put(next(batch_numbers), batch))
+        print(f"🌐 {len(units) - escalated} of {len(units)} keywords settled over HTTP, "
+              f"{escalated} left for the browser")
+    finally:
+        scheduler.done()
 
-# --------------------------- Scrap keywords ---------------------------
-def scrape_keywords_from_spreadsheet() -> typing.List[str]:
-    csv_url = 'https://docs.google.com/spreadsheets/d/1VONI6nuRmR_KRSlBKI8HKzqwFPOgka1CxpaJq1S863U/export?format=csv&gid=0'
-    response = requests.get(csv_url)
-    response.raise_for_status()
 
-    keywords = []
-    reader = csv.reader(response.text.splitlines())
-    next(reader, None)  # Skip the header row if there's one
+def _cdp_worker(scheduler, run, browsers, pages):
+    """Run the DevTools-protocol engine to completion on a fresh event loop."""
+    from cdp_engine import run_cdp_workers  # cdp_engine builds on this module
+    asyncio.run(run_cdp_workers(scheduler, run, browsers=browsers, pages=pages))
 
-    for row in reader:
-        if row and row[0].strip():
-            keywords.append(row[0].strip())
-    return keywords
+
+def ai_overview_detector(all_keywords, workers=1, tabs=1, engine=ENGINE_SELENIUM, max_requests_per_minute=None,
+                         adaptive_rate=None, sessions=None, pacing=None, retry=None, navigation=NAVIGATION_TYPING,
+                         locale=None, locations=None, resource_policy="lean", cache=None, force_refresh=False,
+                         journal=None, sinks=None, archive=None, http_tier=None, feed=None, feed_interval=30.0,
+                         base_url=GOOGLE_URL, metrics=None, summary_path=None):
+    """
+    Detect AI Overview for list of keywords, split into random batches.
+
+    Batches go into a shared queue drained by headless Chrome workers and
+    every result is streamed to the sinks as soon as it settles. Keywords
+    that hit a captcha or an error are searched again in a later batch,
+    possibly on another worker; a keyword that fails every attempt ends
+    with status "unknown" and its "attempts" count.
+
+    Args:
+        all_keywords: keywords to search; results keep their order
+        workers: Chrome workers draining the batch queue
+        tabs: batches every worker's Chrome runs at once, each in its own
+            isolated tab (direct navigation only)
+        engine: browser backend (see ENGINES); with ENGINE_CDP the same
+            workers x tabs pages are driven over the DevTools protocol from
+            one asyncio event loop, without chromedriver (direct navigation
+            only)
+        max_requests_per_minute: cap on searches across all workers
+            combined (None = no cap)
+        adaptive_rate: RateControllerPool pacing each identity's searches
+            with an AIMD controller fed with its captcha outcomes; the fixed
+            cap then acts as a ceiling
+        sessions: SessionPool whose healthiest stored session runs every
+            batch and gets its captcha and latency outcomes back; without
+            one the legacy cookies.pkl is injected
+        pacing: PacingPolicy for human-like delays (NO_PACING disables them)
+        retry: RetryPolicy for captcha'd and errored keywords (NO_RETRY
+            disables retries)
+        navigation: how a search is issued (see NAVIGATION_MODES)
+        locale: hl/gl parameters of every search (the results URL in direct
+            mode, the homepage typed into otherwise), searching from Jakarta
+        locations: LOCATIONS names or make_location dicts to search every
+            keyword from instead, all in one pass: batches of different
+            locations share the same warm browsers, each fresh tab getting
+            its location's geolocation override, and results come keyword
+            by keyword, one per location in this order, each naming its
+            "location"
+        resource_policy: RESOURCE_POLICIES entry applied to every tab
+        cache: ResultCache answering keywords already checked today from
+            disk before any browser starts
+        force_refresh: search cached keywords anyway
+        journal: ScrapeJournal recording every settled keyword, so an
+            unfinished run over the same keyword list only searches what is
+            left
+        sinks: ResultSinks receiving every result; by default an XlsxSink
+            writes ai_overview_results_partN.xlsx files of 100 rows each
+        archive: SerpArchive capturing the HTML of every classified results
+            page, for offline replay with serp_archive.py
+        http_tier: http_fetch.HttpFetcher fetching pending keywords without
+            a browser first; only those whose served HTML stays ambiguous
+            (captcha, error, or no overview unless the fetcher trusts that)
+            are batched for the browsers
+        feed: callable asked for more keywords whenever the workers run dry,
+            so the run and its warm browsers outlive `all_keywords`; it
+            returns a list (empty = none yet) or None once there will be no
+            more. queue_worker.py feeds leased keywords this way. Cannot be
+            combined with a journal, which needs the whole list up front
+        feed_interval: seconds before a feed that had nothing is asked again
+        base_url: another Google front end, e.g. the offline stand-in from
+            serp_standin.py
+        metrics: Metrics for phase timings and outcome counters (default: a
+            fresh one feeding the process-wide METRICS)
+        summary_path: file to also write the JSON run summary to
+
+    Returns:
+        list: one result per keyword and location, in keyword order
+    """
+    if navigation not in NAVIGATION_MODES:
+        raise ValueError(f"Unknown navigation mode {navigation!r}, expected one of {NAVIGATION_MODES}")
+    if resource_policy not in RESOURCE_POLICIES:
+        raise ValueError(f"Unknown resource policy {resource_policy!r}, expected one of {tuple(RESOURCE_POLICIES)}")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if tabs > 1 and navigation != NAVIGATION_DIRECT:
+        raise ValueError("Several tabs per browser need the direct navigation mode")
+    if engine == ENGINE_CDP and navigation != NAVIGATION_DIRECT:
+        raise ValueError("The cdp engine needs the direct navigation mode")
+    if feed is not None and journal is not None:
+        raise ValueError("A journal cannot resume a run whose keywords come from a feed")
+
+    started = time.monotonic()
+    run = _DetectorRun(
+        rate_limiter=RequestRateLimiter(max_requests_per_minute),
+        rate_controllers=adaptive_rate,
+        sessions=sessions,
+        pacing=pacing or PacingPolicy(),
+        retry=retry or RetryPolicy(),
+        navigation=navigation,
+        locations=_resolve_locations(locations, locale),
+        resource_policy=resource_policy,
+        cache=cache,
+        journal=journal,
+        sinks=sinks if sinks is not None else [XlsxSink()],
+        archive=archive,
+        base_url=base_url.rstrip("/"),
+        metrics=metrics if metrics is not None else Metrics(parent=METRICS, keep_samples=True),
+    )
+
+    per_keyword = len(run.locations)
+    units = all_keywords if per_keyword == 1 else [
+        f"{keyword} @ {location['name']}" for keyword in all_keywords for location in run.locations
+    ]
+    # Results from a resumed journal are streamed again, so this run's files are complete
+    journaled = journal.open(units) if journal is not None else {}
+    batch_numbers = itertools.count(1)
+
+    def refill():
+        keywords = feed()
+        if keywords is None:
+            return False
+        if keywords:
+            _plan_batches(run, keywords, scheduler, batch_numbers, cache, force_refresh, http_tier)
+        return True
+
+    scheduler = BatchScheduler(refill=refill if feed is not None else None, refill_interval=feed_interval)
+    searching = _plan_batches(run, all_keywords, scheduler, batch_numbers, cache, force_refresh, http_tier, journaled)
+    if feed is None:
+        workers = max(1, min(workers, searching or 1))
+    print(f"🔍 Total keywords: {len(all_keywords)} x {per_keyword} location(s), searching {searching}"
+          + (" (HTTP first)" if http_tier is not None else "") + f" on {workers} worker(s)"
+          + (", then whatever the feed brings..." if feed is not None else "..."))
+
+    if engine == ENGINE_CDP:
+        # One thread hosts the event loop that drives every browser and page
+        threads = [threading.Thread(target=_cdp_worker, args=(scheduler, run, workers, tabs),
+                                    name="detector-cdp", daemon=True)]
+    else:
+        threads = [
+            threading.Thread(
+                target=_detector_worker,
+                args=(worker_id, scheduler, run, tabs),
+                name=f"detector-worker-{worker_id}",
+                daemon=True,
+            )
+            for worker_id in range(workers)
+        ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    except BaseException:
+        if journal is not None:
+            journal.close()
+        raise
+    finally:
+        for sink in run.sinks:
+            sink.close()
+    if journal is not None:
+        # A worker that died mid-batch leaves holes; keep the run resumable then
+        if all(r is not None for r in run.results):
+            journal.finish()
+        else:
+            journal.close()
+
+    _print_run_summary(run.results, time.monotonic() - started, navigation)
+    if adaptive_rate is not None:
+        for identity, stats in adaptive_rate.stats().items():
+            print(f"🚦 [{identity}] settled at {stats['rpm']:.1f}/min, captcha rate {stats['captcha_rate']:.1%}")
+    if sessions is not None and len(sessions):
+        sessions.save()
+        for name, stats in sessions.stats().items():
+            print(f"🪪 [{name}] health {stats['health']:.2f}, captcha rate {stats['captcha_rate']:.1%}, "
+                  f"{stats['searches']} searches" + (" (stale, log in again)" if stats["stale"] else ""))
+    summary = run.metrics.summary()
+    shares = sorted(summary["phases"].items(), key=lambda item: -item[1]["share"])
+    print("⏱️ Time by phase: " + ", ".join(
+        f"{phase} {stats['share']:.0%}" + (f" (within {SUB_PHASES[phase]})" if phase in SUB_PHASES else "")
+        for phase, stats in shares
+    ))
+    if summary_path:
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return run.results
+
+
+def _print_run_summary(results, elapsed, navigation):
+    """Throughput and bot-detection rate of a run, to compare navigation modes."""
+    results = [r for r in results if r is not None]
+    if not results:
+        return
+    bot_hits = sum(1 for r in results if r["bot_detected"])
+    overviews = sum(1 for r in results if r["detected"])
+    unknown = sum(1 for r in results if r.get("status") == STATUS_UNKNOWN)
+    per_minute = len(results) / elapsed * 60 if elapsed else 0.0
+    print(
+        f"📊 [{navigation}] {len(results)} keywords in {elapsed:.0f}s "
+        f"({per_minute:.1f}/min), AI overviews: {overviews}, "
+        f"bot detection rate: {bot_hits / len(results):.1%}, unknown: {unknown}"
+    )
+
+# --------------------------- Scrap keywords ---------------------------
+KEYWORDS_SHEET_URL = 'https://docs.google.com/spreadsheets/d/1VONI6nuRmR_KRSlBKI8HKzqwFPOgka1CxpaJq1S863U/export?format=csv&gid=0'
+
+def scrape_keywords_from_spreadsheet(csv_url=None) -> typing.List[str]:
+    """Every distinct keyword of the sheet, in sheet order (see keywords.SpreadsheetSource)."""
+    return SpreadsheetSource(csv_url or KEYWORDS_SHEET_URL).fetch().keywords
 
 # --------------------------- Download Excel ---------------------------
 def save_results_to_excel(results, filename="ai_overview_results.xlsx"):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Results"
-
-    # Write header
-    # ws.append(["Keyword", "Detected", "Bot Detected", "Text"])
-    ws.append(["Keyword"])
-    # Write data rows
-    for r in results:
-        ws.append([
-            r["keyword"],
-            r["detected"],
-            r.get("bot_detected", False),
-            r["text"] or ""
-        ])
-
-    wb.save(filename)
-    print(f"✅ Results saved to '{filename}'")
+    with XlsxSink(pattern=filename, rotate_rows=0) as sink:
+        for r in results:
+            sink.write(r)
 
 # --------------------------- Main ---------------------------
 
@@ -456,7 +1593,7 @@ def main():
 
     if driver:
         try:
-            save_cookies_to_pickle(cookies)
+            SessionPool().add(email, cookies)
         finally:
             driver.quit()
     else:
@@ -464,7 +1601,7 @@ def main():
 
     # Example run:
     keywords = ["openai", "machine learning", "deep learning"]
-    results = ai_overview_detector(keywords)
+    results = ai_overview_detector(keywords, sessions=SessionPool())
     print("\n=== Results ===")
     for r in results:
         print(r)
@@ -475,8 +1612,6 @@ def save_results_in_chunks(results, chunk_size=100):
     """
     Save results into separate Excel files every `chunk_size` items.
     """
-    for i in range(0, len(results), chunk_size):
-        chunk = results[i:i + chunk_size]
-        filename = f"ai_overview_results_part{i//chunk_size + 1}.xlsx"
-        save_results_to_excel(chunk, filename)
-        print(f"✅ Saved {len(chunk)} results to {filename}")
+    with XlsxSink(rotate_rows=chunk_size) as sink:
+        for r in results:
+            sink.write(r)
@@ -0,0 +1,165 @@
+# serp_archive.py
+"""
+Record-and-replay archive of SERP HTML for offline re-classification.
+
+A capture run (ai_overview_detector(archive=SerpArchive(...))) stores every
+results page it classifies. Pages are stored once per distinct content under
+objects/<sha256[:2]>/<sha256>.html.gz, and index.jsonl gets one metadata line
+per capture (keyword, location, url, verdict...). Replay re-classifies the
+archive in parallel processes with serp_parser, without a browser:
+
+    python serp_archive.py serp_archive --overview-selector "#m-x-content" --overview-selector "div.new-ai-box"
+
+prints how many pages would change verdict under the given selectors.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from serp_parser import classify_html
+
+
+class SerpArchive:
+    """Content-addressed, gzip-compressed store of captured SERPs plus their metadata index."""
+
+    def __init__(self, directory="serp_archive", compresslevel=6):
+        self.directory = directory
+        self.compresslevel = compresslevel
+        self.index_path = os.path.join(directory, "index.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], f"{digest}.html.gz")
+
+    def put(self, html, **metadata):
+        """Store one captured page (once per distinct content) and index it; returns its sha256."""
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(data, compresslevel=self.compresslevel))
+            # Concurrent captures of the same page write identical bytes, so the last rename wins harmlessly
+            os.replace(tmp_path, path)
+        entry = {"sha256": digest, "captured_at": time.time(), "bytes": len(data), **metadata}
+        with self._lock:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return digest
+
+    def read(self, digest):
+        return _read_object(self.object_path(digest))
+
+    def entries(self):
+        """Every indexed capture, oldest first; a torn last line from a crash is skipped."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def _read_object(path):
+    with gzip.open(path, "rb") as f:
+        return f.read().decode("utf-8")
+
+
+def _classify_object(args):
+    """Replay worker: (digest, verdict, error) of one archived page."""
+    path, digest, groups = args
+    try:
+        return digest, classify_html(_read_object(path), groups), None
+    except Exception as e:
+        return digest, None, str(e)
+
+
+def replay(archive, groups, workers=None, chunksize=64):
+    """
+    Re-classify every archived page with `groups` (BotDetector.selector_groups() format).
+
+    Each distinct page is parsed once, spread over `workers` processes.
+
+    Returns:
+        dict: pages and captures counted, verdict counts, parse errors, and
+        "changed": the captures whose replayed verdict differs from the recorded one
+    """
+    started = time.perf_counter()
+    entries = list(archive.entries())
+    digests = sorted({entry["sha256"] for entry in entries})
+    verdicts, errors = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = ((archive.object_path(digest), digest, groups) for digest in digests)
+        for digest, verdict, error in pool.map(_classify_object, jobs, chunksize=chunksize):
+            if error is None:
+                verdicts[digest] = verdict
+            else:
+                errors[digest] = error
+
+    counts = {}
+    changed = []
+    for entry in entries:
+        verdict = verdicts.get(entry["sha256"])
+        if verdict is None:
+            continue
+        counts[verdict["verdict"]] = counts.get(verdict["verdict"], 0) + 1
+        if verdict["verdict"] != entry.get("verdict"):
+            changed.append({
+                "keyword": entry.get("keyword"),
+                "location": entry.get("location"),
+                "sha256": entry["sha256"],
+                "recorded": entry.get("verdict"),
+                "replayed": verdict["verdict"],
+                "selector": verdict["selector"],
+            })
+    return {
+        "captures": len(entries),
+        "pages": len(digests),
+        "elapsed_s": time.perf_counter() - started,
+        "verdicts": counts,
+        "errors": errors,
+        "changed": changed,
+    }
+
+
+if __name__ == "__main__":
+    from scraper import BotDetector, PAGE_STATE_CAPTCHA, PAGE_STATE_OVERVIEW, PAGE_STATE_RESULTS
+
+    parser = argparse.ArgumentParser(description="Re-classify an archive of captured SERPs without a browser")
+    parser.add_argument("directory", nargs="?", default="serp_archive")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument("--captcha-selector", action="append", help="replace BotDetector.CAPTCHA_SELECTORS")
+    parser.add_argument("--overview-selector", action="append", help="replace BotDetector.OVERVIEW_SELECTORS")
+    parser.add_argument("--results-selector", action="append", help="replace BotDetector.RESULTS_SELECTORS")
+    parser.add_argument("--show", type=int, default=20, help="changed captures to list")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    replay_groups = [
+        [PAGE_STATE_CAPTCHA, args.captcha_selector or list(BotDetector.CAPTCHA_SELECTORS)],
+        [PAGE_STATE_OVERVIEW, args.overview_selector or list(BotDetector.OVERVIEW_SELECTORS)],
+        [PAGE_STATE_RESULTS, args.results_selector or list(BotDetector.RESULTS_SELECTORS)],
+    ]
+    report = replay(SerpArchive(args.directory), replay_groups, workers=args.workers)
+    print(f"🗂️ {report['captures']} captures, {report['pages']} distinct pages re-classified "
+          f"in {report['elapsed_s']:.1f}s: {report['verdicts']}")
+    if report["errors"]:
+        print(f"⚠️ {len(report['errors'])} pages could not be read or parsed")
+    print(f"🔀 {len(report['changed'])} captures would change verdict")
+    for change in report["changed"][:args.show]:
+        print(f"   {change['keyword']!r} @ {change['location']}: {change['recorded']} -> {change['replayed']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,204 @@
+# serp_parser.py
+"""
+Browser-free classification of saved or fetched SERP HTML.
+
+Builds a small element tree with the standard library's html.parser and
+evaluates the same selector groups as BotDetector.CLASSIFY_SCRIPT, so a page
+gets the verdict it would get in Chrome without running one. Supported
+selectors are the ones BotDetector uses: compound CSS selectors without
+combinators (tag, #id, .class, [attr], [attr=v], [attr*=v], [attr^=v],
+[attr$=v]) and absolute positional XPaths such as /html/body/div[1]/br[2].
+Overview text approximates innerText: collapsed whitespace, block elements on
+lines of their own.
+"""
+
+import re
+import time
+from html.parser import HTMLParser
+
+VOID_ELEMENTS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+))
+# Their contents are not rendered text
+SKIPPED_TEXT = frozenset(("script", "style", "noscript", "template", "head"))
+# Rendered on lines of their own, so innerText breaks the line around them
+BLOCK_ELEMENTS = frozenset((
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption", "figure", "footer",
+    "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section",
+    "table", "tr", "td", "th", "ul",
+))
+
+
+_LINE_BREAK = object()
+
+
+class Element:
+    __slots__ = ("tag", "attrs", "children", "parent")
+
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+
+    def iter(self):
+        """This element and all its descendant elements, in document order."""
+        stack = [self]
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend(reversed([child for child in element.children if isinstance(child, Element)]))
+
+    def text(self):
+        """Approximate innerText: collapsed whitespace, one line per block element."""
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node is _LINE_BREAK:
+                parts.append("\n")
+            elif isinstance(node, str):
+                parts.append(re.sub(r"\s+", " ", node))
+            elif node.tag not in SKIPPED_TEXT:
+                if node.tag in BLOCK_ELEMENTS:
+                    parts.append("\n")
+                    stack.append(_LINE_BREAK)
+                stack.extend(reversed(node.children))
+        lines = (line.strip() for line in "".join(parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Element("#document", {})
+        self._stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, {name: value or "" for name, value in attrs}, self._stack[-1])
+        self._stack[-1].children.append(element)
+        if tag not in VOID_ELEMENTS:
+            self._stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        # Close up to the matching open element; stray end tags are ignored like browsers do
+        for depth in range(len(self._stack) - 1, 0, -1):
+            if self._stack[depth].tag == tag:
+                del self._stack[depth:]
+                return
+
+    def handle_data(self, data):
+        self._stack[-1].children.append(data)
+
+
+def parse_html(html):
+    """The document root of `html` (an Element named "#document")."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+_SIMPLE_PART = re.compile(
+    r"""(?P<tag>^[a-zA-Z][\w-]*|^\*)"""
+    r"""|\#(?P<id>[\w-]+)"""
+    r"""|\.(?P<cls>[\w-]+)"""
+    r"""|\[\s*(?P<attr>[\w-]+)\s*(?:(?P<op>[*^$]?=)\s*(?P<quote>['"]?)(?P<value>.*?)(?P=quote))?\s*\]"""
+)
+
+
+def _compile_css(selector):
+    """Predicate for a compound CSS selector; raises ValueError on anything more complex."""
+    checks = []
+    position = 0
+    while position < len(selector):
+        match = _SIMPLE_PART.match(selector, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unsupported CSS selector {selector!r}")
+        position = match.end()
+        if match.group("tag") and match.group("tag") != "*":
+            tag = match.group("tag").lower()
+            checks.append(lambda e, tag=tag: e.tag == tag)
+        elif match.group("id"):
+            checks.append(lambda e, v=match.group("id"): e.attrs.get("id") == v)
+        elif match.group("cls"):
+            checks.append(lambda e, v=match.group("cls"): v in e.attrs.get("class", "").split())
+        elif match.group("attr"):
+            name, op, value = match.group("attr").lower(), match.group("op"), match.group("value")
+            if op is None:
+                checks.append(lambda e, name=name: name in e.attrs)
+            else:
+                test = {
+                    "=": lambda actual, v: actual == v,
+                    "*=": lambda actual, v: bool(v) and v in actual,
+                    "^=": lambda actual, v: bool(v) and actual.startswith(v),
+                    "$=": lambda actual, v: bool(v) and actual.endswith(v),
+                }[op]
+                checks.append(lambda e, name=name, value=value, test=test:
+                              name in e.attrs and test(e.attrs[name], value))
+    return lambda element: all(check(element) for check in checks)
+
+
+_XPATH_STEP = re.compile(r"^([a-zA-Z][\w-]*)(?:\[(\d+)\])?$")
+
+
+def _select_xpath(root, path):
+    """First element at an absolute positional XPath, or None."""
+    if not path.startswith("/") or path.startswith("//"):
+        raise ValueError(f"Unsupported XPath {path!r}, only absolute positional paths are")
+    current = root
+    for step in path.strip("/").split("/"):
+        match = _XPATH_STEP.match(step)
+        if not match:
+            raise ValueError(f"Unsupported XPath step {step!r} in {path!r}")
+        tag, position = match.group(1).lower(), int(match.group(2) or 1)
+        same_tag = [child for child in current.children if isinstance(child, Element) and child.tag == tag]
+        if len(same_tag) < position:
+            return None
+        current = same_tag[position - 1]
+    return current
+
+
+def select(root, selector):
+    """
+    First element matching `selector` in document order, or None.
+    Selectors starting with "xpath:" are XPaths, as in BotDetector.CAPTCHA_SELECTORS.
+    """
+    if selector.startswith("xpath:"):
+        return _select_xpath(root, selector[len("xpath:"):])
+    matches = _compile_css(selector)
+    for element in root.iter():
+        if element is not root and matches(element):
+            return element
+    return None
+
+
+def classify_html(html, groups):
+    """
+    Classify a SERP the way BotDetector.CLASSIFY_SCRIPT does in the browser.
+
+    Args:
+        html: page source
+        groups: [verdict, [selectors]] pairs in match order (BotDetector.selector_groups())
+
+    Returns:
+        dict: verdict (None when no group matches), selector, overview text and elapsed_ms
+    """
+    started = time.perf_counter()
+    root = parse_html(html)
+    for verdict, selectors in groups:
+        for selector in selectors:
+            element = select(root, selector)
+            if element is not None:
+                return {
+                    "verdict": verdict,
+                    "selector": selector,
+                    "text": element.text() if verdict == "overview" else None,
+                    "elapsed_ms": (time.perf_counter() - started) * 1000,
+                }
+    return {"verdict": None, "selector": None, "text": None, "elapsed_ms": (time.perf_counter() - started) * 1000}
@@ -0,0 +1,151 @@
+# serp_standin.py
+"""
+Offline stand-in for Google search, serving the SERP fixtures in fixtures/serp.
+
+    python serp_standin.py --port 8765 --latency 0.2 0.6 --captcha-rate 0.05
+
+then point the detector at it with ai_overview_detector(..., base_url="http://127.0.0.1:8765").
+"""
+
+import argparse
+import html
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "serp")
+
+
+class SerpStandIn:
+    """
+    Threaded HTTP server answering "/" with the homepage and "/search?q=" with a SERP.
+
+    Whether a keyword has an AI overview is a stable function of the keyword,
+    so repeated benchmark runs see the same pages. Captchas, server errors and
+    slow responses are drawn at random per request from a seeded generator.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=(0.05, 0.2), overview_rate=0.5,
+                 captcha_rate=0.0, error_rate=0.0, slow_rate=0.0, slow_latency=5.0,
+                 seed=None, fixtures_dir=FIXTURES_DIR):
+        self.latency = latency
+        self.overview_rate = overview_rate
+        self.captcha_rate = captcha_rate
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.fixtures = {}
+        for name in ("home", "overview", "no_overview", "captcha"):
+            with open(os.path.join(fixtures_dir, f"{name}.html"), encoding="utf-8") as f:
+                self.fixtures[name] = f.read()
+        self.counts = {"home": 0, "overview": 0, "no_overview": 0, "captcha": 0, "error": 0, "slow": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread and return the base URL."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="serp-standin", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def has_overview(self, query):
+        return zlib.crc32(query.encode("utf-8")) % 1000 < self.overview_rate * 1000
+
+    def _draw(self):
+        """Pick (page, delay) for one search request."""
+        with self._lock:
+            roll = self._random.random()
+            slow = self._random.random() < self.slow_rate
+            delay = self._random.uniform(*self.latency)
+        if slow:
+            delay += self.slow_latency
+        if roll < self.error_rate:
+            return "error", delay, slow
+        if roll < self.error_rate + self.captcha_rate:
+            return "captcha", delay, slow
+        return None, delay, slow
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.counts[name] += 1
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/":
+                    standin._count("home")
+                    return self._send(200, standin.fixtures["home"])
+                if url.path != "/search":
+                    return self._send(404, "<html><body>Not found</body></html>")
+
+                query = parse_qs(url.query).get("q", [""])[0]
+                page, delay, slow = standin._draw()
+                time.sleep(delay)
+                if page is None:
+                    page = "overview" if standin.has_overview(query) else "no_overview"
+                standin._count(page, *(("slow",) if slow else ()))
+                if page == "error":
+                    return self._send(500, "<html><body>Server Error</body></html>")
+                body = standin.fixtures[page].replace("{query}", html.escape(query))
+                self._send(429 if page == "captcha" else 200, body)
+
+            def _send(self, status, body):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded SERP fixtures in place of Google")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.05, 0.2), metavar=("MIN", "MAX"))
+    parser.add_argument("--overview-rate", type=float, default=0.5)
+    parser.add_argument("--captcha-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    standin = SerpStandIn(
+        host=args.host, port=args.port, latency=tuple(args.latency), overview_rate=args.overview_rate,
+        captcha_rate=args.captcha_rate, error_rate=args.error_rate, slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency, seed=args.seed,
+    )
+    print(f"🧪 SERP stand-in listening on {standin.base_url}")
+    try:
+        standin.serve_forever()
+    except KeyboardInterrupt:
+        standin.stop()
@@ -0,0 +1,207 @@
+# session_pool.py
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+
+def cdp_cookie(cookie, url=None):
+    """
+    Selenium/WebDriver cookie dict -> Network.setCookies parameter, keeping
+    domain, path, expiry and the secure/httpOnly/sameSite flags.
+    Cookies without a domain are bound to `url` instead.
+    """
+    param = {"name": cookie["name"], "value": cookie["value"]}
+    if cookie.get("domain"):
+        param["domain"] = cookie["domain"]
+        param["path"] = cookie.get("path", "/")
+    elif url:
+        param["url"] = url
+    if cookie.get("expiry") is not None:
+        param["expires"] = cookie["expiry"]
+    for key in ("secure", "httpOnly"):
+        if key in cookie:
+            param[key] = bool(cookie[key])
+    if cookie.get("sameSite") in ("Strict", "Lax", "None"):
+        param["sameSite"] = cookie["sameSite"]
+    return param
+
+
+class Session:
+    """
+    One stored Google identity: its cookies plus the outcome stats used to score it.
+
+    Cookies keep every WebDriver attribute (domain, path, expiry, secure,
+    httpOnly, sameSite). `latency_s` is an exponential moving average of the
+    search latency; `in_use` counts the workers currently holding the session.
+    """
+
+    LATENCY_SMOOTHING = 0.2
+
+    def __init__(self, name, cookies, created_at=None, searches=0, captchas=0, latency_s=None,
+                 last_captcha_at=None):
+        self.name = name
+        self.cookies = cookies
+        self.created_at = created_at if created_at is not None else time.time()
+        self.searches = searches
+        self.captchas = captchas
+        self.latency_s = latency_s
+        self.last_captcha_at = last_captcha_at
+        self.in_use = 0
+
+    @property
+    def age_hours(self):
+        return (time.time() - self.created_at) / 3600
+
+    def captcha_rate(self, prior_searches=5):
+        """Captcha share, pulled towards 0 for sessions with few searches yet."""
+        return self.captchas / (self.searches + prior_searches)
+
+    def expired(self, now=None):
+        """Whether any cookie with an expiry has already expired."""
+        now = now if now is not None else time.time()
+        return any(c.get("expiry") is not None and c["expiry"] <= now for c in self.cookies)
+
+    def record(self, captcha, latency_s=None):
+        self.searches += 1
+        if captcha:
+            self.captchas += 1
+            self.last_captcha_at = time.time()
+        if latency_s is not None:
+            if self.latency_s is None:
+                self.latency_s = latency_s
+            else:
+                self.latency_s += self.LATENCY_SMOOTHING * (latency_s - self.latency_s)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "created_at": self.created_at,
+            "cookies": self.cookies,
+            "stats": {
+                "searches": self.searches,
+                "captchas": self.captchas,
+                "latency_s": self.latency_s,
+                "last_captcha_at": self.last_captcha_at,
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data["cookies"], created_at=data.get("created_at"), **data.get("stats", {}))
+
+
+class SessionPool:
+    """
+    Stored sessions, one JSON file per identity in `directory`, handed out healthiest first.
+
+    Health is 1 minus the captcha rate, minus half the age as a share of
+    `max_age_hours`, minus a tenth of the average latency in seconds, minus
+    `spread_penalty` per worker already holding the session, so concurrent
+    workers spread over the identities instead of piling onto the best one.
+    Sessions past `max_age_hours` or holding expired cookies are stale: they
+    are only handed out when nothing else is left and should be logged in
+    again (see scraper.google_login).
+    """
+
+    def __init__(self, directory="sessions", max_age_hours=72, spread_penalty=0.5):
+        self.directory = directory
+        self.max_age_hours = max_age_hours
+        self.spread_penalty = spread_penalty
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.isdir(self.directory):
+            return
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                    session = Session.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"⚠️ Skipping unreadable session file {filename}: {e}")
+                continue
+            self.sessions[session.name] = session
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def add(self, name, cookies):
+        """Store (or replace) the session `name`, e.g. with the cookies of a fresh google_login."""
+        with self._lock:
+            session = Session(name, list(cookies))
+            self.sessions[name] = session
+            self._write(session)
+        print(f"Session '{name}' saved with {len(session.cookies)} cookies")
+        return session
+
+    def is_stale(self, session):
+        return session.expired() or (bool(self.max_age_hours) and session.age_hours > self.max_age_hours)
+
+    def health(self, session):
+        age_share = session.age_hours / self.max_age_hours if self.max_age_hours else 0.0
+        latency = session.latency_s or 0.0
+        return (1.0 - session.captcha_rate() - 0.5 * min(age_share, 1.0) - latency / 10
+                - self.spread_penalty * session.in_use)
+
+    def acquire(self):
+        """The healthiest session, preferring fresh ones over stale ones; None when the pool is empty."""
+        with self._lock:
+            if not self.sessions:
+                return None
+            session = max(self.sessions.values(),
+                          key=lambda s: (not self.is_stale(s), self.health(s)))
+            session.in_use += 1
+            return session
+
+    def release(self, session):
+        if session is None:
+            return
+        with self._lock:
+            session.in_use = max(0, session.in_use - 1)
+
+    def record(self, session, captcha, latency_s=None):
+        """Feed back the outcome of one search made with `session`."""
+        with self._lock:
+            session.record(captcha, latency_s)
+
+    def stale(self):
+        """Names of the sessions that need a new login."""
+        with self._lock:
+            return [name for name, session in self.sessions.items() if self.is_stale(session)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "health": self.health(session),
+                    "captcha_rate": session.captcha_rate(prior_searches=0) if session.searches else 0.0,
+                    "searches": session.searches,
+                    "latency_s": session.latency_s,
+                    "age_hours": session.age_hours,
+                    "stale": self.is_stale(session),
+                }
+                for name, session in self.sessions.items()
+            }
+
+    def save(self):
+        """Write every session's stats back, so health carries over to the next run."""
+        with self._lock:
+            for session in self.sessions.values():
+                self._write(session)
+
+    def _write(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        filename = re.sub(r"[^A-Za-z0-9._-]+", "_", session.name) + ".json"
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(session.to_dict(), f, indent=2)
+        # Session files hold login cookies; keep them private to the owner
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, os.path.join(self.directory, filename))
@@ -0,0 +1,149 @@
+# sinks.py
+
+import csv
+import json
+import threading
+
+from openpyxl import Workbook  # type: ignore
+
+RESULT_COLUMNS = ["keyword", "detected", "bot_detected", "text", "status", "attempts", "location"]
+
+
+def result_row(result):
+    return [
+        result["keyword"],
+        result["detected"],
+        result.get("bot_detected", False),
+        result["text"] or "",
+        result.get("status", ""),
+        result.get("attempts", ""),
+        result.get("location", "")
+    ]
+
+
+class ResultSink:
+    """
+    Receives detector results one at a time, as soon as each keyword settles.
+    Sinks are shared by all workers, so `write` must be thread-safe.
+    """
+
+    def write(self, result):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RotatingFileSink(ResultSink):
+    """
+    Streams rows into part files named by `pattern`, e.g. "results_part{part}.csv",
+    starting a new part every `rotate_rows` rows (0 = a single file).
+    Only the current part is open, so memory stays flat whatever the keyword count.
+    """
+
+    def __init__(self, pattern, rotate_rows=0):
+        self.pattern = pattern
+        self.rotate_rows = rotate_rows
+        self.part = 0
+        self.rows = 0
+        self.filename = None
+        self._lock = threading.Lock()
+
+    def write(self, result):
+        with self._lock:
+            if self.filename is None or (self.rotate_rows and self.rows >= self.rotate_rows):
+                self._rotate()
+            self._write_row(result)
+            self.rows += 1
+
+    def close(self):
+        with self._lock:
+            if self.filename is not None:
+                self._close_part()
+                print(f"✅ Saved {self.rows} results to {self.filename}")
+                self.filename = None
+
+    def _rotate(self):
+        if self.filename is not None:
+            self._close_part()
+            print(f"✅ Saved {self.rows} results to {self.filename}")
+        self.part += 1
+        self.rows = 0
+        self.filename = self.pattern.format(part=self.part)
+        self._open_part(self.filename)
+
+    def _open_part(self, filename):
+        raise NotImplementedError
+
+    def _write_row(self, result):
+        raise NotImplementedError
+
+    def _close_part(self):
+        raise NotImplementedError
+
+
+class XlsxSink(RotatingFileSink):
+    """Write-only openpyxl workbook per part; rows are streamed out, not kept as cells."""
+    def __init__(self, pattern="ai_overview_results_part{part}.xlsx", rotate_rows=100):
+        super().__init__(pattern, rotate_rows)
+        self._wb = None
+        self._ws = None
+
+    def _open_part(self, filename):
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet("Results")
+        self._ws.append(RESULT_COLUMNS)
+
+    def _write_row(self, result):
+        self._ws.append(result_row(result))
+
+    def _close_part(self):
+        self._wb.save(self.filename)
+        self._wb = self._ws = None
+
+
+class CsvSink(RotatingFileSink):
+    """Appends and flushes one CSV line per result."""
+
+    def __init__(self, pattern="ai_overview_results_part{part}.csv", rotate_rows=10_000):
+        super().__init__(pattern, rotate_rows)
+        self._file = None
+        self._writer = None
+
+    def _open_part(self, filename):
+        self._file = open(filename, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(RESULT_COLUMNS)
+
+    def _write_row(self, result):
+        self._writer.writerow(result_row(result))
+        self._file.flush()
+
+    def _close_part(self):
+        self._file.close()
+        self._file = self._writer = None
+
+
+class JsonlSink(RotatingFileSink):
+    """Appends and flushes the full result record as one JSON line."""
+
+    def __init__(self, pattern="ai_overview_results_part{part}.jsonl", rotate_rows=10_000):
+        super().__init__(pattern, rotate_rows)
+        self._file = None
+
+    def _open_part(self, filename):
+        self._file = open(filename, "w", encoding="utf-8")
+
+    def _write_row(self, result):
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _close_part(self):
+        self._file.close()
+        self._file = None
@@ -0,0 +1,170 @@
+# staleness.py
+"""
+Staleness-aware ordering of keywords under a daily search budget.
+
+Instead of the sheet order, keywords are searched in order of how likely
+their answer has changed since it was last checked, as far as the
+OverviewHistory of past runs tells:
+
+- never checked keywords come first;
+- a keyword's flip rate (state changes per day, smoothed towards
+  `prior_flips_per_day` while its history is short) and the days since its
+  last check give the chance it has flipped since: 1 - exp(-rate * days);
+- a keyword whose last check hit a captcha or an error has no current
+  answer and gets `failure_boost`, halved for every further consecutive
+  failure so one that always fails cannot eat the budget; one that has
+  only ever failed scores that boost alone, not as never checked.
+"""
+
+import heapq
+import json
+import math
+import os
+import threading
+import time
+
+from keywords import normalize_keyword
+from sinks import ResultSink
+
+DAY = 86400.0
+
+
+class StalenessScheduler:
+    """Scores keywords from an OverviewHistory and picks the most stale ones that fit a budget."""
+
+    NEVER_CHECKED = float("inf")
+
+    def __init__(self, history, prior_flips_per_day=0.02, prior_days=7.0, failure_boost=0.5):
+        self.history = history
+        self.prior_flips_per_day = prior_flips_per_day
+        self.prior_days = prior_days
+        self.failure_boost = failure_boost
+
+    def flip_rate(self, state):
+        """Smoothed state changes per day of a keyword's history."""
+        observed_days = 0.0
+        if state["first_checked_at"] is not None:
+            observed_days = max(0.0, state["last_checked_at"] - state["first_checked_at"]) / DAY
+        return (state["flips"] + self.prior_flips_per_day * self.prior_days) / (observed_days + self.prior_days)
+
+    def score(self, state, now=None):
+        """Priority of one keyword_states() entry (None = never checked); higher goes first."""
+        if state is None:
+            return self.NEVER_CHECKED
+        score = 0.0
+        if state["checks"]:
+            now = now if now is not None else time.time()
+            days_since = max(0.0, now - state["last_checked_at"]) / DAY
+            score = 1.0 - math.exp(-self.flip_rate(state) * days_since)
+        elif not state["failures"]:
+            return self.NEVER_CHECKED
+        if state["failures"]:
+            score += self.failure_boost * 0.5 ** (state["failures"] - 1)
+        return score
+
+    def plan(self, keywords, budget=None, locations=("jakarta",)):
+        """
+        `keywords` reordered most stale first, cut to what `budget` searches pay for.
+
+        Every keyword costs one search per location (names, as in the
+        results) and scores as its most stale location. Ties keep the sheet
+        order.
+        """
+        now = time.time()
+        states = [self.history.keyword_states(location) for location in locations]
+        scored = [
+            (-max(self.score(location_states.get(normalize_keyword(keyword)), now) for location_states in states),
+             position, keyword)
+            for position, keyword in enumerate(keywords)
+        ]
+        heapq.heapify(scored)
+        limit = len(keywords) if budget is None else budget // max(1, len(locations))
+        return [heapq.heappop(scored)[2] for _ in range(min(limit, len(scored)))]
+
+
+def _today():
+    return time.strftime("%Y-%m-%d", time.localtime())
+
+
+def _write_json(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class DailyBudget:
+    """
+    Searches allowed per calendar day, with what was spent today kept in a
+    small JSON file so several runs in one day share the budget.
+    """
+
+    def __init__(self, daily_searches, path="search_budget.json"):
+        self.daily_searches = daily_searches
+        self.path = path
+        self._lock = threading.Lock()
+
+    def spent(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        return state["spent"] if state.get("day") == _today() else 0
+
+    def remaining(self):
+        return max(0, self.daily_searches - self.spent())
+
+    def spend(self, searches):
+        with self._lock:
+            _write_json(self.path, {"day": _today(), "spent": self.spent() + searches})
+
+    def sink(self):
+        """A ResultSink charging this budget for each result as it settles."""
+        return BudgetSink(self)
+
+
+class BudgetSink(ResultSink):
+    """Charges a DailyBudget as results come in, so a run that dies midway has still paid for its searches."""
+
+    def __init__(self, budget):
+        self.budget = budget
+
+    def write(self, result):
+        searches = searches_made([result])
+        if searches:
+            self.budget.spend(searches)
+
+
+class DailyPlan:
+    """
+    Today's planned keyword list, kept in a small JSON file until its run
+    completes: a run restarted after a crash searches the same list, so its
+    journal resumes, instead of planning again around what was already spent.
+    """
+
+    def __init__(self, path="search_plan.json"):
+        self.path = path
+
+    def load(self):
+        """Today's unfinished plan, or None."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        return state["keywords"] if state.get("day") == _today() else None
+
+    def save(self, keywords):
+        _write_json(self.path, {"day": _today(), "keywords": keywords})
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def searches_made(results):
+    """
+    Searches a detector run spent: every attempt of every keyword neither
+    answered from the cache nor replayed from a resumed journal.
+    """
+    return sum(r.get("attempts", 1) for r in results
+               if r is not None and not r.get("cached") and not r.get("resumed"))
@@ -0,0 +1,31 @@
+import jobs
+from jobs import JOB_DONE, JobManager
+from result_cache import ResultCache
+
+
+def test_unfinished_job_is_resumed_under_its_id_and_journal(tmp_path, monkeypatch):
+    calls = []
+
+    def detector(keywords, journal=None, **options):
+        calls.append((keywords, journal.path, options["engine"]))
+        # First run: a worker died and left a hole; the resumed run completes
+        return [None] if len(calls) == 1 else [{"keyword": k} for k in keywords]
+
+    monkeypatch.setattr(jobs, "ai_overview_detector", detector)
+    results_dir = str(tmp_path / "results")
+
+    def manager():
+        return JobManager(results_dir=results_dir, webhooks=[], cache=ResultCache(str(tmp_path / "cache.sqlite3")))
+
+    first = manager()
+    job = first.submit(keywords=["kopi"], engine="cdp")
+    first._executor.shutdown(wait=True)
+    assert job.status == JOB_DONE
+
+    second = manager()
+    [resumed] = second.resume_unfinished()
+    second._executor.shutdown(wait=True)
+    assert resumed.id == job.id
+    assert calls[0] == calls[1] == (["kopi"], str(tmp_path / "results" / f"{job.id}.journal.jsonl"), "cdp")
+    # Completed now, so a third start has nothing left to resume
+    assert manager().resume_unfinished() == []
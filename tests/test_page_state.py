@@ -0,0 +1,26 @@
+from scraper import PAGE_STATE_OVERVIEW, PAGE_STATE_RESULTS, PAGE_STATE_TIMEOUT, PageStateTracker
+
+
+def _verdict(state):
+    return {"verdict": state, "selector": None, "text": None, "elapsed_ms": 0.1, "round_trip_ms": 1.0}
+
+
+def test_known_state_is_final_right_away():
+    tracker = PageStateTracker(timeout=10, overview_grace=10)
+    assert tracker.feed(None) is None
+    overview = _verdict(PAGE_STATE_OVERVIEW)
+    assert tracker.feed(overview) is overview
+
+
+def test_results_wait_out_the_overview_grace():
+    tracker = PageStateTracker(timeout=10, overview_grace=10)
+    assert tracker.feed(_verdict(PAGE_STATE_RESULTS)) is None
+    assert PageStateTracker(timeout=10, overview_grace=0).feed(_verdict(PAGE_STATE_RESULTS))["verdict"] == \
+        PAGE_STATE_RESULTS
+
+
+def test_timeout_falls_back_to_the_first_results_seen():
+    tracker = PageStateTracker(timeout=0, overview_grace=10)
+    first = _verdict(PAGE_STATE_RESULTS)
+    assert tracker.feed(first) is first
+    assert PageStateTracker(timeout=0).feed(None)["verdict"] == PAGE_STATE_TIMEOUT
@@ -0,0 +1,84 @@
+import threading
+
+import scraper
+from retry_queue import NO_RETRY, BatchScheduler
+from sinks import ResultSink
+
+
+def test_get_returns_none_once_in_flight_batch_is_done():
+    scheduler = BatchScheduler()
+    scheduler.put(1, ["a"])
+    assert scheduler.get(timeout=0) == (1, ["a"])
+    # Still in flight: it may put retries back, so no one is told the queue is drained yet
+    assert scheduler.get(timeout=0.05) is None
+    assert not scheduler.finished()
+    scheduler.done()
+    assert scheduler.finished()
+    assert scheduler.get() is None
+
+
+def test_refill_feeds_batches_until_exhausted():
+    feed = [[], ["b"], None]
+
+    def refill():
+        more = feed.pop(0)
+        if more:
+            scheduler.put(2, more)
+        return more is not None
+
+    scheduler = BatchScheduler(refill=refill, refill_interval=0.01)
+    scheduler.put(1, ["a"])
+    assert scheduler.get(timeout=1) == (1, ["a"])
+    scheduler.done()
+    assert not scheduler.finished()
+    # The first refill finds nothing, the next one is tried after refill_interval
+    assert scheduler.get(timeout=1) == (2, ["b"])
+    scheduler.done()
+    assert scheduler.get(timeout=1) is None
+    assert scheduler.finished()
+    assert feed == []
+
+
+class _BrokenBrowser:
+    """DriverManager stand-in whose browser never starts."""
+
+    cookie_file = "cookies.pkl"
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start_batch(self, *args, **kwargs):
+        raise RuntimeError("Chrome did not start")
+
+    def quit(self):
+        pass
+
+
+class _SinkFailingOnce(ResultSink):
+    def __init__(self):
+        self.failed = False
+        self.rows = []
+
+    def write(self, result):
+        if not self.failed:
+            self.failed = True
+            raise OSError("database is locked")
+        self.rows.append(result)
+
+
+def test_detector_finishes_when_a_sink_fails_inside_an_aborted_batch(monkeypatch):
+    monkeypatch.setattr(scraper, "DriverManager", _BrokenBrowser)
+    sink = _SinkFailingOnce()
+    keywords = [f"keyword {i}" for i in range(12)]
+    finished = []
+
+    def run():
+        finished.append(scraper.ai_overview_detector(
+            keywords, workers=2, pacing=scraper.NO_PACING, retry=NO_RETRY, sinks=[sink],
+        ))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(30)
+    assert not thread.is_alive(), "ai_overview_detector hung on an unacknowledged batch"
+    assert len(sink.rows) == len(keywords) - 1
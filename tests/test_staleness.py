@@ -0,0 +1,30 @@
+from staleness import DailyBudget, StalenessScheduler
+
+
+def _state(checks=0, failures=0, last_checked_at=None):
+    return {"checks": checks, "flips": 0, "first_checked_at": last_checked_at, "last_checked_at": last_checked_at,
+            "failures": failures, "last_failure_at": None, "last_failure": "captcha" if failures else None}
+
+
+def test_keyword_that_only_ever_failed_is_not_scored_as_never_checked():
+    scheduler = StalenessScheduler(history=None, failure_boost=0.5)
+    assert scheduler.score(None) == StalenessScheduler.NEVER_CHECKED
+    assert scheduler.score(_state(failures=1)) == 0.5
+    assert scheduler.score(_state(failures=3)) == 0.125
+
+
+def test_failures_add_to_the_staleness_of_a_checked_keyword():
+    scheduler = StalenessScheduler(history=None, failure_boost=0.5)
+    checked = _state(checks=4, last_checked_at=0.0)
+    now = 2 * 86400.0
+    assert scheduler.score(_state(checks=4, failures=2, last_checked_at=0.0), now) == \
+        scheduler.score(checked, now) + 0.25
+
+
+def test_budget_sink_charges_only_searches_made_by_this_run(tmp_path):
+    budget = DailyBudget(10, path=str(tmp_path / "budget.json"))
+    sink = budget.sink()
+    for result in ({"attempts": 2}, {"attempts": 1, "cached": True}, {"attempts": 3, "resumed": True}):
+        sink.write(result)
+    assert budget.spent() == 2
+    assert budget.remaining() == 8
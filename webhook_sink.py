@@ -0,0 +1,225 @@
+# webhook_sink.py
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from retry_queue import RetryPolicy
+from sinks import ResultSink
+
+# Statuses a receiver may answer while busy or restarting; anything else 4xx will not improve with retries
+RETRYABLE_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+
+class WebhookSink(ResultSink):
+    """
+    Pushes results to webhook URLs (e.g. an n8n Webhook node) in batches,
+    without ever making the detector wait for the receiver.
+
+    Every URL gets its own delivery thread and keep-alive connection. A batch
+    goes out once `batch_size` results are waiting or the oldest has waited
+    `max_wait` seconds, as one gzip-compressed JSON POST:
+    {"batch_id", "sent_at", "count", "results": [...]}, with the batch id
+    also in the X-Batch-Id header so receivers can drop a re-delivered batch.
+    Failed POSTs are retried with `retry`'s backoff (honouring Retry-After).
+    A batch that still fails, or results piling up past `max_pending`
+    because the receiver is slow, are spilled to `spill_dir` as
+    ready-to-send bodies and delivered once the receiver answers again,
+    in this run or the next. Bodies the receiver rejects outright (other
+    4xx) are moved to `spill_dir`/<url>/rejected for inspection.
+    """
+
+    def __init__(self, urls, batch_size=100, max_wait=5.0, max_pending=5000, spill_dir="webhook_spill",
+                 spill_retry=30.0, retry=None, timeout=(5, 30), headers=None, compresslevel=6):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.spill_dir = spill_dir
+        self.spill_retry = spill_retry
+        self.retry = retry or RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=30.0)
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.compresslevel = compresslevel
+        self.channels = [_Channel(self, url) for url in urls]
+
+    def write(self, result):
+        for channel in self.channels:
+            channel.add(result)
+
+    def close(self):
+        """Send what is buffered, spill what cannot be sent, and stop the delivery threads."""
+        for channel in self.channels:
+            channel.close()
+        for channel in self.channels:
+            channel.join()
+            stats = channel.stats
+            print(f"📮 [{channel.url}] {stats['delivered']} results delivered in {stats['batches']} batches"
+                  + (f", {stats['spilled']} batches spilled to {channel.spill_dir}" if stats["spilled"] else "")
+                  + (f", {stats['rejected']} rejected" if stats["rejected"] else ""))
+
+
+class _Channel:
+    """Buffer, delivery thread and spill directory of one webhook URL."""
+
+    def __init__(self, sink, url):
+        self.sink = sink
+        self.url = url
+        self.spill_dir = os.path.join(sink.spill_dir, hashlib.sha1(url.encode("utf-8")).hexdigest()[:12])
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.stats = {"delivered": 0, "batches": 0, "spilled": 0, "rejected": 0}
+        self._buffer = []
+        self._oldest = None
+        self._spilled = len(self._spill_files())
+        self._next_spill_try = 0.0
+        self._cond = threading.Condition()
+        self._closing = threading.Event()
+        self._http = requests.Session()
+        self._http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self._http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self._thread = threading.Thread(target=self._run, name=f"webhook-{self.spill_dir[-12:]}", daemon=True)
+        self._thread.start()
+
+    def add(self, result):
+        overflow = None
+        with self._cond:
+            if len(self._buffer) >= self.sink.max_pending:
+                # The receiver is not keeping up; park the backlog on disk rather than grow without bound
+                overflow, self._buffer = self._buffer, []
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(result)
+            self._cond.notify()
+        if overflow:
+            for start in range(0, len(overflow), self.sink.batch_size):
+                self._spill(*self._encode(overflow[start:start + self.sink.batch_size]))
+
+    def close(self):
+        with self._cond:
+            self._closing.set()
+            self._cond.notify()
+
+    def join(self):
+        self._thread.join()
+        self._http.close()
+
+    def _ready(self, now):
+        if len(self._buffer) >= self.sink.batch_size:
+            return True
+        return bool(self._buffer) and (self._closing.is_set() or now - self._oldest >= self.sink.max_wait)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if self._ready(now):
+                        batch = self._buffer[:self.sink.batch_size]
+                        del self._buffer[:self.sink.batch_size]
+                        self._oldest = now if self._buffer else None
+                        break
+                    if self._closing.is_set():
+                        return
+                    if self._spilled and now >= self._next_spill_try:
+                        batch = None
+                        break
+                    wait = self.sink.max_wait - (now - self._oldest) if self._buffer else None
+                    if self._spilled:
+                        wait = min(wait or self.sink.spill_retry, max(0.0, self._next_spill_try - now))
+                    self._cond.wait(wait)
+            if batch is None:
+                self._resend_spilled()
+                continue
+            batch_id, body = self._encode(batch)
+            outcome = self._post(batch_id, body, attempts=self.sink.retry.max_attempts)
+            if outcome == "delivered":
+                self.stats["delivered"] += len(batch)
+                self.stats["batches"] += 1
+                # The receiver is back; drain what was spilled while it was not
+                self._next_spill_try = 0.0
+            elif outcome == "rejected":
+                self._reject(batch_id, body)
+            else:
+                self._spill(batch_id, body)
+
+    def _encode(self, batch):
+        batch_id = uuid.uuid4().hex
+        payload = {"batch_id": batch_id, "sent_at": time.time(), "count": len(batch), "results": batch}
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        return batch_id, gzip.compress(body, compresslevel=self.sink.compresslevel)
+
+    def _post(self, batch_id, body, attempts):
+        """Outcome of sending one body: "delivered", "rejected" (a 4xx retries will not fix) or "failed"."""
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip", "X-Batch-Id": batch_id,
+                   **self.sink.headers}
+        for attempt in range(1, attempts + 1):
+            retry_after = None
+            try:
+                response = self._http.post(self.url, data=body, headers=headers, timeout=self.sink.timeout)
+                if response.status_code < 300:
+                    return "delivered"
+                if response.status_code not in RETRYABLE_STATUSES:
+                    print(f"⚠️ Webhook {self.url} rejected batch {batch_id}: HTTP {response.status_code}")
+                    return "rejected"
+                retry_after = response.headers.get("Retry-After")
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt == attempts or self._closing.is_set():
+                print(f"⚠️ Webhook {self.url} failed batch {batch_id} after {attempt} attempt(s): {error}")
+                return "failed"
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.sink.retry.delay(attempt)
+            # Closing cuts the backoff short; the batch is spilled instead
+            self._closing.wait(min(delay, self.sink.retry.max_delay))
+        return "failed"
+
+    def _spill_files(self):
+        return sorted(name for name in os.listdir(self.spill_dir) if name.endswith(".json.gz"))
+
+    def _spill(self, batch_id, body):
+        fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        # Named by time so spilled batches are re-sent oldest first
+        os.replace(tmp_path, os.path.join(self.spill_dir, f"{time.time_ns()}-{batch_id}.json.gz"))
+        with self._cond:
+            self._spilled += 1
+            self.stats["spilled"] += 1
+
+    def _reject(self, batch_id, body):
+        rejected_dir = os.path.join(self.spill_dir, "rejected")
+        os.makedirs(rejected_dir, exist_ok=True)
+        with open(os.path.join(rejected_dir, f"{batch_id}.json.gz"), "wb") as f:
+            f.write(body)
+        self.stats["rejected"] += 1
+
+    def _resend_spilled(self):
+        """Try the oldest spilled batch once; on failure wait `spill_retry` before the next try."""
+        files = self._spill_files()
+        if not files:
+            with self._cond:
+                self._spilled = 0
+            return
+        path = os.path.join(self.spill_dir, files[0])
+        batch_id = files[0].split("-", 1)[1][:-len(".json.gz")]
+        with open(path, "rb") as f:
+            body = f.read()
+        outcome = self._post(batch_id, body, attempts=1)
+        if outcome == "failed":
+            self._next_spill_try = time.monotonic() + self.sink.spill_retry
+            return
+        if outcome == "delivered":
+            self.stats["delivered"] += json.loads(gzip.decompress(body))["count"]
+            self.stats["batches"] += 1
+        else:
+            self._reject(batch_id, body)
+        os.remove(path)
+        with self._cond:
+            self._spilled -= 1
@@ -0,0 +1,196 @@
+# work_queue.py
+
+import json
+import sqlite3
+import threading
+import time
+
+from keywords import normalize_keyword
+
+ITEM_PENDING = "pending"
+ITEM_LEASED = "leased"
+ITEM_DONE = "done"
+
+
+class WorkQueue:
+    """
+    Keywords shared out between scraper nodes under time-limited leases.
+
+    A node `lease`s a few items, keeps them alive with `heartbeat` while it
+    searches, then `complete`s each one with its results or `release`s it for
+    another node. Items whose lease runs out (the node died or hung) are
+    delivered again, so every keyword is searched at least once and, as long
+    as leases are kept alive, only once. The first completion of an item
+    wins; a late one from a node that lost its lease is dropped.
+
+    Leased items are dicts with id, keyword, position and deliveries (this
+    delivery included). SqliteWorkQueue is the local backend; a broker-backed
+    queue only has to implement these methods.
+    """
+
+    def enqueue(self, queue, keywords):
+        """Add keywords to `queue`, skipping ones it already holds; returns how many were added."""
+        raise NotImplementedError
+
+    def lease(self, queue, owner, limit, lease_s):
+        raise NotImplementedError
+
+    def heartbeat(self, owner, item_ids, lease_s):
+        """Extend `owner`'s leases on `item_ids`; returns how many it still holds."""
+        raise NotImplementedError
+
+    def complete(self, owner, item_id, results):
+        """Store an item's results; False when another node already completed it."""
+        raise NotImplementedError
+
+    def release(self, owner, item_id, delay=0.0):
+        """Hand a leased item back, to be delivered again after `delay` seconds."""
+        raise NotImplementedError
+
+    def results(self, queue):
+        """Results of every completed item, in enqueue order."""
+        raise NotImplementedError
+
+    def stats(self, queue):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    WorkQueue in one SQLite file, shared by every node that can open it.
+
+    Containers on one host share it through a volume; leasing takes SQLite's
+    write lock, so two nodes never lease the same item at once. Network
+    filesystems do not implement the locking WAL mode relies on, so nodes on
+    several hosts need a broker-backed WorkQueue instead.
+    """
+
+    def __init__(self, path="work_queue.sqlite3", busy_timeout=30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit, with explicit BEGIN IMMEDIATE where a read has to be followed by its write
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " id INTEGER PRIMARY KEY, queue TEXT NOT NULL, key TEXT NOT NULL, keyword TEXT NOT NULL,"
+            " position INTEGER NOT NULL, state TEXT NOT NULL, deliveries INTEGER NOT NULL DEFAULT 0,"
+            " owner TEXT, lease_expires REAL, available_at REAL NOT NULL, result TEXT, updated_at REAL NOT NULL,"
+            " UNIQUE (queue, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_ready ON items (queue, state, position)")
+
+    def enqueue(self, queue, keywords):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                start = self._conn.execute(
+                    "SELECT COALESCE(MAX(position) + 1, 0) FROM items WHERE queue = ?", (queue,)
+                ).fetchone()[0]
+                added = 0
+                for offset, keyword in enumerate(keywords):
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO items (queue, key, keyword, position, state, available_at, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (queue, normalize_keyword(keyword), keyword, start + offset, ITEM_PENDING, now, now),
+                    )
+                    added += cursor.rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def lease(self, queue, owner, limit, lease_s):
+        """Up to `limit` ready items for `owner`, including ones whose previous lease expired."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, keyword, position, deliveries FROM items WHERE queue = ? AND ("
+                    " (state = ? AND available_at <= ?) OR (state = ? AND lease_expires <= ?))"
+                    " ORDER BY position LIMIT ?",
+                    (queue, ITEM_PENDING, now, ITEM_LEASED, now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE items SET state = ?, owner = ?, lease_expires = ?, deliveries = deliveries + 1,"
+                    " updated_at = ? WHERE id = ?",
+                    [(ITEM_LEASED, owner, now + lease_s, now, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            {"id": item_id, "keyword": keyword, "position": position, "deliveries": deliveries + 1}
+            for item_id, keyword, position, deliveries in rows
+        ]
+
+    def heartbeat(self, owner, item_ids, lease_s):
+        if not item_ids:
+            return 0
+        now = time.time()
+        placeholders = ", ".join("?" * len(item_ids))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE items SET lease_expires = ?, updated_at = ?"
+                f" WHERE owner = ? AND state = ? AND id IN ({placeholders})",
+                (now + lease_s, now, owner, ITEM_LEASED, *item_ids),
+            )
+        return cursor.rowcount
+
+    def complete(self, owner, item_id, results):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE items SET state = ?, owner = ?, result = ?, lease_expires = NULL, updated_at = ?"
+                " WHERE id = ? AND state != ?",
+                (ITEM_DONE, owner, json.dumps(results, ensure_ascii=False), time.time(), item_id, ITEM_DONE),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, owner, item_id, delay=0.0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE items SET state = ?, owner = NULL, lease_expires = NULL, available_at = ?, updated_at = ?"
+                " WHERE id = ? AND owner = ? AND state = ?",
+                (ITEM_PENDING, now + delay, now, item_id, owner, ITEM_LEASED),
+            )
+
+    def results(self, queue):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM items WHERE queue = ? AND state = ? ORDER BY position", (queue, ITEM_DONE)
+            ).fetchall()
+        return [result for (results,) in rows for result in json.loads(results)]
+
+    def stats(self, queue):
+        """Item counts per state, leases that ran out, and items delivered more than once."""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM items WHERE queue = ? GROUP BY state", (queue,)
+            ).fetchall())
+            expired, redelivered, owners = self._conn.execute(
+                "SELECT SUM(state = ? AND lease_expires <= ?), SUM(deliveries > 1),"
+                " COUNT(DISTINCT CASE WHEN state = ? THEN owner END) FROM items WHERE queue = ?",
+                (ITEM_LEASED, now, ITEM_LEASED, queue),
+            ).fetchone()
+        return {
+            "total": sum(counts.values()),
+            ITEM_PENDING: counts.get(ITEM_PENDING, 0),
+            ITEM_LEASED: counts.get(ITEM_LEASED, 0),
+            ITEM_DONE: counts.get(ITEM_DONE, 0),
+            "expired_leases": expired or 0,
+            "redelivered": redelivered or 0,
+            "active_nodes": owners,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()